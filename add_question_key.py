@@ -1,24 +1,32 @@
-
 import os
 from dotenv import load_dotenv
 from langsmith import Client
+from agent.sync_dataset import SyncPlan, apply_plan
 
 load_dotenv()
 client = Client()
 
 dataset_name = "ds-granular-oleo-34"
-examples = list(client.list_examples(dataset_name=dataset_name))
-
-print(f"Adding 'question' key for {len(examples)} examples...")
+dataset = client.read_dataset(dataset_name=dataset_name)
+examples = list(client.list_examples(dataset_id=dataset.id))
 
+# Only examples that do not have the key yet need an update
+updates = []
 for ex in examples:
+    if "question" in ex.inputs:
+        continue
+
     # Use the existing 'task' or 'input' content
     content = ex.inputs.get("task") or ex.inputs.get("input")
-    
+
     new_inputs = ex.inputs.copy()
     new_inputs["question"] = content
-    
-    client.update_example(ex.id, inputs=new_inputs)
-    print(f"Updated {ex.id} with 'question' key.")
+    updates.append({"id": str(ex.id), "inputs": new_inputs})
+
+print(f"Adding 'question' key for {len(updates)} of {len(examples)} examples...")
+
+# Chunked bulk updates instead of one request per example
+if updates:
+    apply_plan(client, dataset.id, SyncPlan(create=[], update=updates, delete=[], unchanged=len(examples) - len(updates)))
 
 print("Done! Your {question} variable in the Playground will now work.")
@@ -0,0 +1,302 @@
+# agent/benchmarks.py
+
+"""
+Deterministic benchmark suite for the agent's own overhead.
+
+All LLM calls go to the offline StubChatModel, so the numbers measure prompt
+formatting, parsing, Pydantic validation and orchestration rather than provider
+latency. A configurable simulated latency is used for the concurrency benchmarks.
+
+Usage:
+    python -m agent.benchmarks --output bench.json
+    python -m agent.benchmarks --output bench.json --baseline baseline.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Route every LLM call to the stub model, keep caches out of the measurements and
+# pin every opt-in layer off, so a .env or shell setting cannot change what is timed
+BENCH_ENV = {
+    "PRIMARY_LLM_PROVIDER": "stub",
+    "REACT_LLM_PROVIDER": "stub",
+    "PLAN_CACHE_PATH": "",
+    "INCREMENTAL_STORE_PATH": "",
+    "LANGSMITH_TRACING_V2": "false",
+    "SCHEDULER_ENABLED": "false",
+    "SIMILARITY_INDEX_PATH": "",
+    "LLM_CASSETTE_MODE": "",
+    "LLM_PROVIDER_CHAIN": "",
+    "EVAL_PRESCREEN": "false",
+    "REACT_SESSION": "false",
+    "PLAN_HIERARCHICAL": "false",
+    "TASK_INDEX_PATH": "",
+}
+
+# Directory that contains the `agent` package (for the startup subprocesses)
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLAN_SIZES = [5, 20, 100]
+CONCURRENCY_LEVELS = [1, 4, 16]
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def pin_environment():
+    """
+    Apply BENCH_ENV to this process. Must run before any agent module reads its
+    configuration (settings are read once, on first use).
+    """
+    os.environ.update(BENCH_ENV)
+
+
+def configure_stub(latency: float = 0.0, num_steps: int = 5, filler_words: int = 0):
+    """Apply latency and output size to every shared stub model."""
+    from agent import config
+    from agent.config import get_llm
+
+    for temperature in (config.PLANNER_TEMPERATURE, None, 0.2):
+        llm = get_llm(provider="stub", temperature=temperature)
+        while getattr(llm, "inner", None) is not None:
+            llm = llm.inner   # unwrap the scheduler / cassette wrappers
+        llm.latency = latency
+        llm.num_steps = num_steps
+        llm.filler_words = filler_words
+
+
+def measure(fn, repeat: int, number: int = 1):
+    """
+    Time `fn` `number` times per sample, `repeat` samples.
+    Returns per-call statistics in seconds.
+    """
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # warm-up (imports, registry, pydantic schema build)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+
+    return {
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def bench_planner_parse(results: dict, repeat: int):
+    from agent.planner import TaskPlanner
+
+    planner = TaskPlanner(use_cache=False)
+    for size in PLAN_SIZES:
+        configure_stub(num_steps=size, filler_words=8)
+        results[f"planner.generate_todo[steps={size}]"] = measure(
+            lambda: planner.generate_todo("Build a personal website"), repeat, number=20
+        )
+
+
+def bench_extract_user_input(results: dict, repeat: int):
+    from agent.run_experiment import extract_user_input
+
+    examples = [
+        {"task": "Build a personal website"},
+        {"messages": [[{"kwargs": {"content": "Topic: Learn Rust in a month"}}]]},
+        {"messages": [{"role": "user", "content": '{"task": "Plan a team offsite"}'}]},
+        "Write a blog post about caching",
+    ]
+    results["run_experiment.extract_user_input"] = measure(
+        lambda: [extract_user_input(example) for example in examples], repeat, number=2000
+    )
+
+
+def bench_evaluator(results: dict, repeat: int):
+    from agent.evaluators import PlanEvaluator
+
+    configure_stub()
+    evaluator = PlanEvaluator()
+    for size in PLAN_SIZES:
+        plan = [f"Implement part {i + 1} of the website" for i in range(size)]
+        results[f"evaluator.evaluate[steps={size}]"] = measure(
+            lambda: evaluator.evaluate("Build a personal website", plan), repeat, number=20
+        )
+
+
+def bench_graph_invoke(results: dict, repeat: int):
+    from agent.graph import build_graph
+
+    configure_stub()
+    # Planning only and without checkpoints, as in experiments
+    graph = build_graph(execute=False, evaluate=False, checkpoint=False)
+    state = {"messages": [{"role": "user", "content": "Build a personal website"}]}
+    results["graph.invoke"] = measure(lambda: graph.invoke(state), repeat, number=20)
+
+
+def bench_react_loop(results: dict, repeat: int, latency: float):
+    from agent.react_loop import react_loop, react_loop_parallel
+
+    configure_stub(latency=latency)
+    for size in [5, 15]:
+        todos = [f"Implement part {i + 1}" for i in range(size)]
+        results[f"react_loop[steps={size}]"] = measure(
+            lambda: react_loop("Build a personal website", todos), repeat
+        )
+        for level in CONCURRENCY_LEVELS:
+            results[f"react_loop_parallel[steps={size},parallel={level}]"] = measure(
+                lambda: react_loop_parallel("Build a personal website", todos, max_parallel=level), repeat
+            )
+
+
+def bench_batch_planning(results: dict, repeat: int, latency: float):
+    from agent.planner import TaskPlanner
+
+    configure_stub(latency=latency)
+    planner = TaskPlanner(use_cache=False)
+    tasks = [f"Build website number {i}" for i in range(32)]
+    for level in CONCURRENCY_LEVELS:
+        results[f"planner.generate_todos[tasks=32,concurrency={level}]"] = measure(
+            lambda: planner.generate_todos(tasks, max_concurrency=level), repeat
+        )
+
+
+# Code run in a fresh interpreter: import time of the planner, then time to first plan
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from agent.planner import TaskPlanner
+imported = time.perf_counter()
+TaskPlanner(use_cache=False).generate_todo("Build a personal website")
+planned = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_plan": planned - start}))
+"""
+
+
+def bench_startup(results: dict, repeat: int):
+    """
+    Cold-start cost measured in fresh processes: `import agent.planner`
+    and time to the first plan with the stub model.
+    """
+    env = dict(os.environ, **BENCH_ENV, PYTHONPATH=PACKAGE_PARENT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    samples = {"startup.import_planner": [], "startup.first_plan": [], "startup.process_total": []}
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        total = time.perf_counter() - start
+        timings = json.loads(output.strip().splitlines()[-1])
+        samples["startup.import_planner"].append(timings["import"])
+        samples["startup.first_plan"].append(timings["first_plan"])
+        samples["startup.process_total"].append(total)
+
+    for name, values in samples.items():
+        results[name] = {
+            "median": statistics.median(values),
+            "mean": statistics.fmean(values),
+            "min": min(values),
+            "max": max(values),
+            "repeat": repeat,
+            "number": 1,
+        }
+
+
+def run_benchmarks(repeat: int = 5, latency: float = 0.01):
+    """
+    Run the whole suite and return a JSON-serializable report.
+    """
+    pin_environment()
+    results = {}
+    bench_startup(results, repeat)
+    bench_planner_parse(results, repeat)
+    bench_extract_user_input(results, repeat)
+    bench_evaluator(results, repeat)
+    bench_graph_invoke(results, repeat)
+    bench_react_loop(results, repeat, latency)
+    bench_batch_planning(results, repeat, latency)
+
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "simulated_latency": latency,
+            "created_at": time.time(),
+        },
+        "results": results,
+    }
+
+
+# -----------------------------
+# Baseline comparison
+# -----------------------------
+def compare(baseline: dict, current: dict, tolerance: float = 0.25):
+    """
+    Compare median timings against a baseline report.
+
+    Returns:
+        list: One dict per regressed benchmark (median slower by more than `tolerance`)
+    """
+    regressions = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["median"]:
+            continue
+        ratio = stats["median"] / base["median"]
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "benchmark": name,
+                "baseline": base["median"],
+                "current": stats["median"],
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the deterministic benchmark suite.")
+    parser.add_argument("--output", default="bench.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown ratio (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated LLM latency in seconds")
+    args = parser.parse_args()
+
+    report = run_benchmarks(repeat=args.repeat, latency=args.latency)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in report["results"].items():
+        print(f"{name:60s} {stats['median'] * 1000:10.3f} ms")
+    print(f"\n📄 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for item in regressions:
+                print(f"   {item['benchmark']}: {item['baseline'] * 1000:.3f} ms -> {item['current'] * 1000:.3f} ms (x{item['ratio']})")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
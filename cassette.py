@@ -0,0 +1,230 @@
+# agent/cassette.py
+
+"""
+Record/replay layer for LLM calls.
+
+With LLM_CASSETTE_MODE=record, every chat model from `config.get_llm` stores
+each request fingerprint and its response (streamed chunks included) in a
+compact SQLite file (zlib-compressed JSON, indexed by fingerprint). A request
+sent several times (e.g. multi-sample judging) keeps one response per
+occurrence; occurrences are numbered inside SQLite, so several processes can
+record into one file. Recording into an existing cassette appends, so delete
+the file to re-record from scratch.
+
+With LLM_CASSETTE_MODE=replay, responses are served from memory, in recorded
+order for repeated requests, with no provider, network or API key. A request
+sent more often than during recording gets its last recorded response; one
+that was never recorded raises CassetteMiss.
+
+Usage:
+    LLM_CASSETTE_MODE=record python run_experiment.py
+    LLM_CASSETTE_MODE=replay python run_experiment.py
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agent import config
+
+
+class CassetteMiss(RuntimeError):
+    """
+    Raised in replay mode for a request that was never recorded.
+
+    Like a provider error it fails the one example (or fails over to the next
+    provider in a hedged chain); misses are counted on the cassette.
+    """
+
+
+def fingerprint(provider: str, model: str, temperature, messages: List[BaseMessage], stop=None, **kwargs) -> str:
+    """Content address of one chat request."""
+    payload = json.dumps(
+        [provider, model, temperature, [(m.type, m.content) for m in messages], stop, kwargs],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    SQLite store of recorded responses, one row per (request, occurrence).
+    In replay mode every entry is loaded into a dict once; only the per-request
+    replay counters are shared between threads.
+    """
+
+    def __init__(self, path: str, replay: bool = False):
+        self.path = path
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._entries = {}
+        self._occurrences = {}
+
+        if replay:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette not found: {path} (record it with LLM_CASSETTE_MODE=record)")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (key, occurrence)
+            ) WITHOUT ROWID
+            """
+        )
+        if replay:
+            # {storage key: [payload per occurrence, in recorded order]}
+            for key, payload in conn.execute("SELECT key, payload FROM responses ORDER BY key, occurrence"):
+                self._entries.setdefault(key, []).append(payload)
+
+    def _connect(self):
+        """Return a per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _storage_key(key: str, kind: str) -> str:
+        # Invoke and stream responses for the same request are stored separately
+        return f"{kind}:{key}"
+
+    def get(self, key: str, kind: str) -> list:
+        """
+        Return the recorded messages for the next occurrence of a request
+        (the last recorded one once they run out), or raise CassetteMiss.
+        """
+        storage_key = self._storage_key(key, kind)
+        payloads = self._entries.get(storage_key)
+        with self._lock:
+            if payloads is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                occurrence = self._occurrences.get(storage_key, 0)
+                self._occurrences[storage_key] = occurrence + 1
+        if payloads is None:
+            raise CassetteMiss(f"No recorded {kind} response for request {key[:12]} in {self.path}")
+        payload = payloads[min(occurrence, len(payloads) - 1)]
+        return messages_from_dict(json.loads(zlib.decompress(payload)))
+
+    def put(self, key: str, kind: str, messages: list):
+        """Store a response as the next occurrence of its request."""
+        payload = zlib.compress(json.dumps([message_to_dict(m) for m in messages], ensure_ascii=False).encode("utf-8"))
+        storage_key = self._storage_key(key, kind)
+        conn = self._connect()
+        # The write lock is taken up front, so processes recording the same
+        # request at once get distinct occurrence numbers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            occurrence = conn.execute(
+                "SELECT COALESCE(MAX(occurrence) + 1, 0) FROM responses WHERE key = ?", (storage_key,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO responses (key, occurrence, kind, payload, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (storage_key, occurrence, kind, payload, time.time()),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_cassettes = {}
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Return the shared cassette for config.LLM_CASSETTE_PATH and the current mode."""
+    path = config.LLM_CASSETTE_PATH
+    replay = config.LLM_CASSETTE_MODE == "replay"
+    with _cassette_lock:
+        if (path, replay) not in _cassettes:
+            _cassettes[(path, replay)] = Cassette(path, replay=replay)
+        return _cassettes[(path, replay)]
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Chat model that records `inner`'s responses, or replays them without `inner`.
+    """
+
+    inner: Any = None          # Not needed (and not built) in replay mode
+    provider: str
+    model_name: str
+    temperature: Optional[float] = None
+    mode: str = "replay"       # "record" or "replay"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.provider}"
+
+    def _key(self, messages, stop, kwargs) -> str:
+        return fingerprint(self.provider, self.model_name, self.temperature, messages, stop, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cassette = get_cassette()
+
+        if self.mode == "replay":
+            message = cassette.get(key, "invoke")[0]
+        else:
+            message = self.inner.invoke(messages, stop=stop, **kwargs)
+            cassette.put(key, "invoke", [message])
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages, stop, kwargs)
+        cassette = get_cassette()
+
+        if self.mode == "replay":
+            for chunk in cassette.get(key, "stream"):
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        chunks = []
+        for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            chunks.append(chunk)
+            yield ChatGenerationChunk(message=chunk)
+        # Only complete streams are recorded
+        cassette.put(key, "stream", chunks)
@@ -1,14 +1,21 @@
 
 from agent.evaluators import PlanEvaluator
+from agent import config
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+config.load_env()
 
 evaluator = PlanEvaluator()
 try:
     print(f"Using Provider: {os.getenv('PRIMARY_LLM_PROVIDER')}")
     res = evaluator.evaluate("Test task", ["Step 1", "Step 2"])
     print("Evaluation Success:", res)
+
+    # Adaptive multi-sampling: extra judge calls only while `overall` keeps varying
+    res = evaluator.evaluate_consistent("Test task", ["Step 1", "Step 2"])
+    if res:
+        print(f"Consistent Evaluation: overall={res.overall:.3f} spread={res.spread:.3f} samples={res.samples}")
+    else:
+        print("Consistent Evaluation Failed.")
 except Exception as e:
     print("Evaluation Failed:", e)
@@ -0,0 +1,74 @@
+
+import os
+import time
+
+from langchain_core.messages import HumanMessage
+
+# Short probe interval so check 5 does not have to wait 30 seconds
+os.environ["HEDGE_PROBE_SECONDS"] = "0.2"
+
+from agent import config
+from agent.failover import HedgedChatModel, ProviderHealth, get_health
+from agent.stub_llm import StubChatModel
+
+# Provider ordering checks with local stub providers (no network, no API keys)
+prompt = [HumanMessage(content="Current TODO:\nSet up project")]
+
+
+def order(hedged):
+    return [provider for provider, _ in hedged._ordered()]
+
+
+# 1. A provider that fails every call must drop behind a working one once its
+#    error rate is established, even before either has enough samples for a p95
+hedged = HedgedChatModel(
+    models=[StubChatModel(error_rate=1.0), StubChatModel()],
+    providers=["check-dead", "check-ok"],
+    hedge_after=5.0,
+)
+for _ in range(config.HEDGE_MIN_SAMPLES):
+    hedged.generate([prompt])
+print("Failing provider:", order(hedged), get_health("check-dead").snapshot())
+assert order(hedged) == ["check-ok", "check-dead"], "failing provider stayed first"
+
+# 2. A healthy primary with a known p95 must stay ahead of an untried provider
+hedged = HedgedChatModel(
+    models=[StubChatModel(), StubChatModel()],
+    providers=["check-primary", "check-untried"],
+    hedge_after=5.0,
+)
+for _ in range(config.HEDGE_MIN_SAMPLES + 5):
+    hedged.generate([prompt])
+print("Healthy primary:", order(hedged), get_health("check-primary").snapshot())
+assert get_health("check-primary").p95() is not None
+assert order(hedged) == ["check-primary", "check-untried"], "untried provider jumped ahead"
+
+# 3. One transient error must not demote a provider before its error rate is established
+health = ProviderHealth()
+health.record_error()
+print("One error:", health.snapshot())
+assert health.score() == 1.0, "a single error demoted the provider"
+
+# 4. Errors older than the health window stop counting
+health = ProviderHealth(window_seconds=0.1)
+for _ in range(config.HEDGE_MIN_SAMPLES):
+    health.record_error()
+assert health.error_rate() == 1.0
+time.sleep(0.2)
+print("Aged-out errors:", health.snapshot())
+assert health.error_rate() == 0.0, "old errors still count"
+
+# 5. A demoted provider that has been idle gets a background probe
+hedged = HedgedChatModel(
+    models=[StubChatModel(), StubChatModel()],
+    providers=["check-serving", "check-idle"],
+    hedge_after=5.0,
+)
+hedged._ordered()
+time.sleep(config.HEDGE_PROBE_SECONDS + 0.1)
+hedged.generate([prompt])
+time.sleep(0.1)
+print("Idle provider:", get_health("check-idle").snapshot())
+assert get_health("check-idle").snapshot()["samples"] == 1, "idle provider was not probed"
+
+print("Failover ordering checks passed.")
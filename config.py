@@ -1,33 +1,362 @@
 import os
-from dotenv import load_dotenv
+import threading
+
+# -----------------------------
+# Environment loading
+# -----------------------------
+# The .env file is read once, on first access to a setting, so importing
+# agent modules does no I/O.
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env():
+    """Load the .env file once per process."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
 
-load_dotenv()
 
 # -----------------------------
 # LLM Provider Configuration
 # -----------------------------
-# Options: "groq", "openai", "anthropic"
-PRIMARY_PROVIDER = os.getenv("PRIMARY_LLM_PROVIDER", "groq")
+# PRIMARY_PROVIDER options: "groq", "openai", "anthropic", "stub" (offline deterministic model)
 
 # Model Names
 GROQ_MODEL = "llama-3.3-70b-versatile"
 OPENAI_MODEL = "gpt-4o-mini"
 ANTHROPIC_MODEL = "claude-3-5-sonnet-20240620"
+STUB_MODEL = "stub-model"
+OLLAMA_MODEL = "tinyllama"   # Local model used by the ReAct loop (llama3 also works)
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() != "false"
+
+
+# Default (requests per minute, tokens per minute) per provider; 0 = unlimited.
+# Override with e.g. GROQ_RPM / GROQ_TPM to match your account tier.
+DEFAULT_RATE_LIMITS = {
+    "groq": (30, 12000),
+    "openai": (500, 200000),
+    "anthropic": (50, 40000),
+}
+
+
+def _rate_limits() -> dict:
+    limits = {}
+    for provider, (rpm, tpm) in DEFAULT_RATE_LIMITS.items():
+        prefix = provider.upper()
+        limits[provider] = (
+            float(os.getenv(f"{prefix}_RPM", rpm)),
+            float(os.getenv(f"{prefix}_TPM", tpm)),
+        )
+    return limits
+
+
+def _base_urls() -> dict:
+    # Optional endpoint overrides, e.g. OPENAI_BASE_URL for a proxy or a local mock server
+    urls = {}
+    for provider in ("groq", "openai", "ollama"):
+        url = os.getenv(f"{provider.upper()}_BASE_URL")
+        if url:
+            urls[provider] = url
+    return urls
+
+
+# Settings read from the environment (after .env is loaded) on first access,
+# e.g. `config.PRIMARY_PROVIDER`. Values are cached for the rest of the process.
+_ENV_SETTINGS = {
+    "PRIMARY_PROVIDER": lambda: os.getenv("PRIMARY_LLM_PROVIDER", "groq"),
+
+    # Provider for the ReAct loop: "ollama" (local) or "stub" (offline deterministic model)
+    "REACT_PROVIDER": lambda: os.getenv("REACT_LLM_PROVIDER", "ollama"),
+
+    # Sampling temperature used by TaskPlanner
+    "PLANNER_TEMPERATURE": lambda: float(os.getenv("PLANNER_TEMPERATURE", "0.2")),
+
+    # Maximum number of planner requests in flight for batch planning
+    "PLANNER_MAX_CONCURRENCY": lambda: int(os.getenv("PLANNER_MAX_CONCURRENCY", "5")),
+
+    # Maximum number of independent ReAct steps sent to Ollama at once
+    "REACT_MAX_PARALLEL": lambda: int(os.getenv("REACT_MAX_PARALLEL", "4")),
+
+    # ReAct sessions: stable prompt prefix plus bounded history (opt-in with "true";
+    # the default is one self-contained prompt per TODO), and how long Ollama keeps the model loaded
+    "REACT_SESSION": lambda: _env_bool("REACT_SESSION", "false"),
+    "REACT_MAX_HISTORY": lambda: int(os.getenv("REACT_MAX_HISTORY", "6")),
+    "OLLAMA_KEEP_ALIVE": lambda: os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+
+    # Batch judging limits for PlanEvaluator.evaluate_many
+    "EVAL_BATCH_SIZE": lambda: int(os.getenv("EVAL_BATCH_SIZE", "10")),
+    "EVAL_BATCH_MAX_CHARS": lambda: int(os.getenv("EVAL_BATCH_MAX_CHARS", "12000")),
+    "EVAL_MAX_CONCURRENCY": lambda: int(os.getenv("EVAL_MAX_CONCURRENCY", "5")),
+
+    # Adaptive multi-sample judging (PlanEvaluator.evaluate_consistent): sampling
+    # temperature, sample cap, variance of `overall` to stop at, and the band of
+    # first-sample scores considered ambiguous enough to need a second sample
+    "EVAL_SAMPLE_TEMPERATURE": lambda: float(os.getenv("EVAL_SAMPLE_TEMPERATURE", "0.7")),
+    "EVAL_MAX_SAMPLES": lambda: int(os.getenv("EVAL_MAX_SAMPLES", "5")),
+    "EVAL_VARIANCE_TOLERANCE": lambda: float(os.getenv("EVAL_VARIANCE_TOLERANCE", "0.0025")),
+    "EVAL_AMBIGUOUS_LOW": lambda: float(os.getenv("EVAL_AMBIGUOUS_LOW", "0.55")),
+    "EVAL_AMBIGUOUS_HIGH": lambda: float(os.getenv("EVAL_AMBIGUOUS_HIGH", "0.85")),
+
+    # Heuristic pre-scoring in front of the judge (agent.heuristics): plans scoring at
+    # or below LOW are settled locally; plans at or above HIGH too, if HIGH is set.
+    # Off by default because settled plans get heuristic rather than judge scores;
+    # enable it after calibrating against the judge. The calibration file maps
+    # heuristic to judge scores.
+    "EVAL_PRESCREEN": lambda: os.getenv("EVAL_PRESCREEN", "false").lower() == "true",
+    "EVAL_PRESCREEN_LOW": lambda: float(os.getenv("EVAL_PRESCREEN_LOW", "0.35")),
+    "EVAL_PRESCREEN_HIGH": lambda: float(os.getenv("EVAL_PRESCREEN_HIGH")) if os.getenv("EVAL_PRESCREEN_HIGH") else None,
+    "EVAL_PRESCREEN_CALIBRATION": lambda: os.getenv("EVAL_PRESCREEN_CALIBRATION"),
+
+    # Plan cache: set PLAN_CACHE_PATH (e.g. ".cache/plans.sqlite") to enable it
+    "PLAN_CACHE_PATH": lambda: os.getenv("PLAN_CACHE_PATH"),
+    "PLAN_CACHE_MAX_ENTRIES": lambda: int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "10000")),
+    "PLAN_CACHE_MAX_AGE": lambda: float(os.getenv("PLAN_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600))),
+
+    # Instrumentation: per-stage latency/token/cost recording (set to "false" to disable)
+    "INSTRUMENTATION_ENABLED": lambda: _env_bool("INSTRUMENTATION_ENABLED", "true"),
+    # Optional file to write metrics to after an experiment run (.json, or .prom for Prometheus text)
+    "METRICS_PATH": lambda: os.getenv("METRICS_PATH"),
+
+    # Incremental experiment store: set INCREMENTAL_STORE_PATH (e.g. ".cache/experiments.sqlite")
+    # to reuse unchanged planner/judge results across experiment runs
+    "INCREMENTAL_STORE_PATH": lambda: os.getenv("INCREMENTAL_STORE_PATH"),
+
+    # Normalized dataset cache: directory for task index files, and an optional
+    # prebuilt index to use (set by the runners for their worker processes)
+    "TASK_INDEX_DIR": lambda: os.getenv("TASK_INDEX_DIR", ".cache/task_index"),
+    "TASK_INDEX_PATH": lambda: os.getenv("TASK_INDEX_PATH"),
+
+    # Provider failover: ordered chain such as "groq,openai,anthropic" (empty = primary only),
+    # hedge delay in seconds, and samples needed before a provider's rolling p95 / error rate is used
+    "LLM_PROVIDER_CHAIN": lambda: [p.strip() for p in os.getenv("LLM_PROVIDER_CHAIN", "").split(",") if p.strip()],
+    "HEDGE_AFTER_SECONDS": lambda: float(os.getenv("HEDGE_AFTER_SECONDS", "2.0")),
+    "HEDGE_MIN_SAMPLES": lambda: int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+    # Health stats only cover the last HEDGE_HEALTH_WINDOW_SECONDS; a provider that has
+    # not been called for HEDGE_PROBE_SECONDS gets a background probe (0 = never)
+    "HEDGE_HEALTH_WINDOW_SECONDS": lambda: float(os.getenv("HEDGE_HEALTH_WINDOW_SECONDS", "300")),
+    "HEDGE_PROBE_SECONDS": lambda: float(os.getenv("HEDGE_PROBE_SECONDS", "30")),
+
+    # Request scheduler: rate limits, adaptive concurrency and priority lanes (agent.scheduler)
+    "SCHEDULER_ENABLED": lambda: _env_bool("SCHEDULER_ENABLED", "true"),
+    "SCHEDULER_MAX_CONCURRENCY": lambda: int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "8")),
+    "SCHEDULER_MAX_RETRIES": lambda: int(os.getenv("SCHEDULER_MAX_RETRIES", "5")),
+    # Completion tokens reserved per request before the real usage is known
+    "SCHEDULER_COMPLETION_TOKENS": lambda: int(os.getenv("SCHEDULER_COMPLETION_TOKENS", "256")),
+    "LLM_RATE_LIMITS": _rate_limits,
+
+    # Per-provider API endpoint overrides (<PROVIDER>_BASE_URL), used e.g. by agent.loadtest
+    "LLM_BASE_URLS": _base_urls,
+
+    # Near-duplicate plan reuse: set SIMILARITY_INDEX_PATH (e.g. ".cache/similar.sqlite") to enable.
+    # Plans of tasks at or above the reuse threshold are returned as-is; at or above
+    # the seed threshold they are passed to the planner prompt as a reference.
+    "SIMILARITY_INDEX_PATH": lambda: os.getenv("SIMILARITY_INDEX_PATH"),
+    "PLAN_REUSE_THRESHOLD": lambda: float(os.getenv("PLAN_REUSE_THRESHOLD", "0.85")),
+    "PLAN_SEED_THRESHOLD": lambda: float(os.getenv("PLAN_SEED_THRESHOLD", "0.5")),
+
+    # Hierarchical planning (agent.plan_tree): levels of steps, children per step,
+    # total prompt + completion tokens per tree, and whether write_todos uses it by default
+    "PLAN_MAX_DEPTH": lambda: int(os.getenv("PLAN_MAX_DEPTH", "2")),
+    "PLAN_MAX_WIDTH": lambda: int(os.getenv("PLAN_MAX_WIDTH", "6")),
+    "PLAN_TOKEN_BUDGET": lambda: int(os.getenv("PLAN_TOKEN_BUDGET", "6000")),
+    "PLAN_HIERARCHICAL": lambda: _env_bool("PLAN_HIERARCHICAL", "false"),
+
+    # SQLite file for LangGraph checkpoints (agent.graph); lets interrupted runs resume
+    "GRAPH_CHECKPOINT_PATH": lambda: os.getenv("GRAPH_CHECKPOINT_PATH", ".cache/graph_checkpoints.sqlite"),
 
-def get_model_name():
-    if PRIMARY_PROVIDER == "groq":
+    # Record/replay of LLM calls (agent.cassette): "record", "replay" or empty (off)
+    "LLM_CASSETTE_MODE": lambda: os.getenv("LLM_CASSETTE_MODE", "").lower(),
+    "LLM_CASSETTE_PATH": lambda: os.getenv("LLM_CASSETTE_PATH", ".cache/cassette.sqlite"),
+
+    # Planner service (agent.server): bind address, micro-batch window and size,
+    # pending requests per endpoint before 503, and per-request wait limit in seconds
+    "SERVER_HOST": lambda: os.getenv("SERVER_HOST", "127.0.0.1"),
+    "SERVER_PORT": lambda: int(os.getenv("SERVER_PORT", "8765")),
+    "SERVER_BATCH_WINDOW_MS": lambda: float(os.getenv("SERVER_BATCH_WINDOW_MS", "10")),
+    "SERVER_MAX_BATCH": lambda: int(os.getenv("SERVER_MAX_BATCH", "16")),
+    "SERVER_MAX_QUEUE": lambda: int(os.getenv("SERVER_MAX_QUEUE", "256")),
+    # Batches of one endpoint that may run at the same time
+    "SERVER_MAX_INFLIGHT_BATCHES": lambda: int(os.getenv("SERVER_MAX_INFLIGHT_BATCHES", "4")),
+    "SERVER_REQUEST_TIMEOUT": lambda: float(os.getenv("SERVER_REQUEST_TIMEOUT", "120")),
+
+    # Connection pool settings for the HTTP clients shared by all chat models
+    "LLM_MAX_CONNECTIONS": lambda: int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    "LLM_KEEPALIVE_SECONDS": lambda: float(os.getenv("LLM_KEEPALIVE_SECONDS", "60")),
+    "LLM_TIMEOUT_SECONDS": lambda: float(os.getenv("LLM_TIMEOUT_SECONDS", "120")),
+}
+
+
+def setting(name: str):
+    """Return an environment-backed setting, reading it on first use."""
+    if name in globals():
+        return globals()[name]
+    load_env()
+    value = _ENV_SETTINGS[name]()
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name: str):
+    """Resolve `config.<SETTING>` lazily (PEP 562)."""
+    if name not in _ENV_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return setting(name)
+
+
+def get_provider():
+    """Return the configured primary LLM provider."""
+    return setting("PRIMARY_PROVIDER")
+
+
+def get_model_name(provider: str = None):
+    provider = provider or get_provider()
+    if provider == "groq":
         return GROQ_MODEL
-    elif PRIMARY_PROVIDER == "openai":
+    elif provider == "openai":
         return OPENAI_MODEL
-    elif PRIMARY_PROVIDER == "anthropic":
+    elif provider == "anthropic":
         return ANTHROPIC_MODEL
+    elif provider == "stub":
+        return STUB_MODEL
+    elif provider == "ollama":
+        return OLLAMA_MODEL
     return GROQ_MODEL
 
-def get_api_key():
-    if PRIMARY_PROVIDER == "groq":
+def get_api_key(provider: str = None):
+    load_env()
+    provider = provider or get_provider()
+    if provider == "groq":
         return os.getenv("GROQ_API_KEY")
-    elif PRIMARY_PROVIDER == "openai":
+    elif provider == "openai":
         return os.getenv("OPENAI_API_KEY")
-    elif PRIMARY_PROVIDER == "anthropic":
+    elif provider == "anthropic":
         return os.getenv("ANTHROPIC_API_KEY")
     return None
+
+# -----------------------------
+# Shared LLM Client Registry
+# -----------------------------
+_llm_registry = {}
+_http_clients = {}
+_registry_lock = threading.Lock()
+
+
+def _get_http_client(provider: str):
+    """Return the pooled keep-alive HTTP client for a provider (one per process)."""
+    if provider not in _http_clients:
+        import httpx
+
+        max_connections = setting("LLM_MAX_CONNECTIONS")
+        _http_clients[provider] = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=setting("LLM_KEEPALIVE_SECONDS"),
+            ),
+            timeout=httpx.Timeout(setting("LLM_TIMEOUT_SECONDS"), connect=10.0),
+        )
+    return _http_clients[provider]
+
+
+def _build_chat_model(provider: str, model: str, temperature):
+    """Construct a chat model for the given provider. Provider SDKs are imported on demand."""
+    if provider == "stub":
+        from agent.stub_llm import StubChatModel
+        return StubChatModel(model=model, temperature=temperature)
+    base_url = setting("LLM_BASE_URLS").get(provider)
+    if provider == "ollama":
+        # keep_alive keeps the model (and its prompt cache) loaded between requests
+        from langchain_ollama import ChatOllama
+        extra = {"base_url": base_url} if base_url else {}
+        return ChatOllama(model=model, temperature=temperature, keep_alive=setting("OLLAMA_KEEP_ALIVE"), **extra)
+
+    kwargs = {"model": model, "api_key": get_api_key(provider)}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if base_url:
+        kwargs["base_url"] = base_url
+
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(http_client=_get_http_client(provider), **kwargs)
+    elif provider == "anthropic":
+        # The Anthropic SDK keeps its own pooled client per model instance
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(**kwargs)
+    else:
+        from langchain_groq import ChatGroq
+        return ChatGroq(http_client=_get_http_client("groq"), **kwargs)
+
+
+def get_llm(provider: str = None, model_name: str = None, temperature: float = None):
+    """
+    Return the shared chat model for (provider, model, temperature).
+
+    Each combination is built once per process and reused, so callers share
+    one client and its keep-alive connections instead of opening new ones.
+    A temperature of None keeps the provider default.
+
+    Unless SCHEDULER_ENABLED is false, the model is wrapped so its requests go
+    through the shared rate-limit-aware scheduler (the raw model is `.inner`).
+    With LLM_CASSETTE_MODE set, a record/replay layer sits on top; in replay
+    mode no provider model is built at all.
+    """
+    provider = provider or get_provider()
+    model = model_name or get_model_name(provider)
+    key = (provider, model, temperature)
+
+    with _registry_lock:
+        if key not in _llm_registry:
+            _llm_registry[key] = _build_registry_model(provider, model, temperature)
+        return _llm_registry[key]
+
+
+def _build_registry_model(provider: str, model: str, temperature):
+    cassette_mode = setting("LLM_CASSETTE_MODE")
+    if cassette_mode == "replay":
+        from agent.cassette import CassetteChatModel
+        return CassetteChatModel(provider=provider, model_name=model, temperature=temperature, mode="replay")
+
+    chat_model = _build_chat_model(provider, model, temperature)
+    if setting("SCHEDULER_ENABLED"):
+        from agent.scheduler import ScheduledChatModel
+        chat_model = ScheduledChatModel(inner=chat_model, provider=provider)
+
+    if cassette_mode == "record":
+        from agent.cassette import CassetteChatModel
+        chat_model = CassetteChatModel(
+            inner=chat_model, provider=provider, model_name=model, temperature=temperature, mode="record"
+        )
+    return chat_model
+
+
+def get_chat_model(model_name: str = None, temperature: float = None):
+    """
+    Return the chat model for the planner and evaluator.
+
+    With LLM_PROVIDER_CHAIN set this is a shared HedgedChatModel over the chain
+    (see agent.failover); otherwise the primary provider's model from `get_llm`.
+    """
+    chain = setting("LLM_PROVIDER_CHAIN")
+    if len(chain) < 2:
+        provider = chain[0] if chain else get_provider()
+        # `model_name` names a model of the primary provider
+        model = model_name if provider == get_provider() else None
+        return get_llm(provider=provider, model_name=model, temperature=temperature)
+
+    key = ("chain", tuple(chain), model_name, temperature)
+    if key not in _llm_registry:
+        from agent.failover import build_hedged_model
+        model = build_hedged_model(chain, model_name=model_name, temperature=temperature)
+        with _registry_lock:
+            _llm_registry.setdefault(key, model)
+    return _llm_registry[key]
@@ -10,11 +10,9 @@ client = Client(api_key=os.getenv("LANGSMITH_API_KEY"))
 
 DATASET_NAME = "ds-granular-oleo-34"
 
-existing = [d.name for d in client.list_datasets()]
-if DATASET_NAME not in existing:
-    client.create_dataset(name=DATASET_NAME)
+# Direct lookup instead of listing every dataset
+if not client.has_dataset(dataset_name=DATASET_NAME):
+    client.create_dataset(DATASET_NAME)
     print(f"Dataset '{DATASET_NAME}' created.")
 else:
     print(f"Dataset '{DATASET_NAME}' already exists.")
-
-
@@ -1,12 +1,6 @@
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from langchain_core.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
-import os
-import json
-from dotenv import load_dotenv
-
-load_dotenv()
+from functools import lru_cache
+from pydantic import BaseModel, Field, ValidationError
+from typing import List
 
 class EvaluationResult(BaseModel):
     relevance: float = Field(description="Score for relevance (0.0 - 1.0)")
@@ -15,6 +9,17 @@ class EvaluationResult(BaseModel):
     actionability: float = Field(description="Score for actionability (0.0 - 1.0)")
     overall: float = Field(description="Overall final score (0.0 - 1.0)")
 
+class IndexedEvaluationResult(EvaluationResult):
+    index: int = Field(description="Number of the plan being scored (as shown in its header)")
+
+class BatchEvaluationResult(BaseModel):
+    results: List[IndexedEvaluationResult] = Field(description="One score entry per plan")
+
+class ConsistentEvaluationResult(EvaluationResult):
+    """Scores averaged over several judge samples."""
+    spread: float = Field(description="Standard deviation of `overall` across samples")
+    samples: int = Field(description="Number of judge samples used")
+
 # 🔹 Evaluation prompt for task planning quality
 EVALUATION_PROMPT_TEMPLATE = """
 You are an expert evaluator of task-planning quality.
@@ -50,26 +55,119 @@ Generated TODO list:
 Evaluate the plan using the criteria above.
 """
 
-from agent.config import get_model_name, get_api_key, PRIMARY_PROVIDER
+# 🔹 Batch evaluation prompt: several (request, plan) pairs judged in one call
+BATCH_EVALUATION_PROMPT_TEMPLATE = """
+You are an expert evaluator of task-planning quality.
+
+Judge how well EACH generated TODO list below satisfies its own user request.
+Score every plan independently; do not compare plans with each other.
+
+IMPORTANT RULES:
+- Do NOT require exact wording
+- Do NOT penalize different task order
+- Accept multiple valid plans
+
+Evaluate based on:
+- Relevance: tasks align with the goal
+- Completeness: major steps are present
+- Clarity: tasks are understandable
+- Actionability: tasks can be executed
+
+Score generously but honestly.
+
+Scoring guide:
+0.6–0.7 = acceptable
+0.8–0.9 = strong
+1.0 = excellent
+
+{format_instructions}
+
+Return exactly one entry per plan, with "index" set to the plan number.
+
+{plans}
+
+Evaluate every plan using the criteria above.
+"""
+
+BATCH_PLAN_TEMPLATE = """### Plan {index}
+User request:
+{input}
+
+Generated TODO list:
+{output}
+"""
+
+from agent import config
+from agent.instrumentation import get_instrumentation
+from agent.config import get_model_name, get_chat_model
+
+@lru_cache(maxsize=None)
+def _judge_templates():
+    """
+    Build the prompt templates, parsers and format instructions once per process,
+    on first use (keeps `import agent.evaluators` cheap).
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import PydanticOutputParser, JsonOutputParser
+
+    parser = PydanticOutputParser(pydantic_object=EvaluationResult)
+    return {
+        "parser": parser,
+        "prompt": ChatPromptTemplate.from_template(EVALUATION_PROMPT_TEMPLATE),
+        "format_instructions": parser.get_format_instructions(),
+        "batch_prompt": ChatPromptTemplate.from_template(BATCH_EVALUATION_PROMPT_TEMPLATE),
+        "batch_format_instructions": PydanticOutputParser(
+            pydantic_object=BatchEvaluationResult
+        ).get_format_instructions(),
+        "json_parser": JsonOutputParser(),
+    }
 
 class PlanEvaluator:
-    def __init__(self, model_name: str = None):
-        model = model_name or get_model_name()
-        api_key = get_api_key()
-        
-        if PRIMARY_PROVIDER == "groq":
-            self.llm = ChatGroq(model=model, api_key=api_key)
-        elif PRIMARY_PROVIDER == "openai":
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(model=model, api_key=api_key)
-        elif PRIMARY_PROVIDER == "anthropic":
-            from langchain_anthropic import ChatAnthropic
-            self.llm = ChatAnthropic(model=model, api_key=api_key)
-        else:
-            self.llm = ChatGroq(model=model, api_key=api_key)
-            
-        self.parser = PydanticOutputParser(pydantic_object=EvaluationResult)
-        self.prompt = ChatPromptTemplate.from_template(EVALUATION_PROMPT_TEMPLATE)
+    def __init__(self, model_name: str = None, temperature: float = None, prescreen: bool = None):
+        self.model_name = model_name or get_model_name()
+        self.temperature = temperature
+
+        # Settle clear-cut plans with local heuristics before calling the judge
+        self.prescreen = config.EVAL_PRESCREEN if prescreen is None else prescreen
+
+        # Shared chat model from the client registry (provider default temperature
+        # unless given), hedged across LLM_PROVIDER_CHAIN when configured
+        self.llm = get_chat_model(model_name=self.model_name, temperature=temperature)
+
+        # Templates, parsers and format instructions are shared by all evaluators
+        templates = _judge_templates()
+        self.parser = templates["parser"]
+        self.prompt = templates["prompt"]
+        self.format_instructions = templates["format_instructions"]
+        self.chain = self.prompt | self.llm | self.parser
+
+        self.batch_prompt = templates["batch_prompt"]
+        self.batch_format_instructions = templates["batch_format_instructions"]
+        self.batch_chain = self.batch_prompt | self.llm | templates["json_parser"]
+
+    def _prescreened(self, user_request: str, generated_plan):
+        """
+        Calibrated heuristic result for a clear-cut plan, or None when the judge is needed.
+        """
+        if not self.prescreen or not isinstance(generated_plan, list):
+            return None
+        from agent.heuristics import prescreen, to_evaluation
+
+        metrics = get_instrumentation()
+        with metrics.stage("evaluator.prescreen", "heuristic"):
+            result = prescreen(user_request, generated_plan)
+        if result.decision == "uncertain":
+            return None
+        # Count of judge calls saved, visible in the metrics snapshot
+        metrics.record("evaluator.prescreen.short_circuit", 0.0, "heuristic")
+        return to_evaluation(result)
+
+    @staticmethod
+    def _format_plan(generated_plan):
+        # Handle both list of steps and raw string
+        if isinstance(generated_plan, list):
+            return "\n".join([f"{i+1}. {step}" for i, step in enumerate(generated_plan)])
+        return str(generated_plan)
 
     def evaluate(self, user_request: str, generated_plan: list):
         """
@@ -78,27 +176,231 @@ class PlanEvaluator:
         if not generated_plan:
             return EvaluationResult(relevance=0, completeness=0, clarity=0, actionability=0, overall=0)
 
-        # Handle both list of steps and raw string
-        if isinstance(generated_plan, list):
-            formatted_plan = "\n".join([f"{i+1}. {step}" for i, step in enumerate(generated_plan)])
-        else:
-            formatted_plan = str(generated_plan)
-        
-        # Prepare the chain
-        chain = self.prompt | self.llm | self.parser
+        settled = self._prescreened(user_request, generated_plan)
+        if settled is not None:
+            return settled
+        return self._judge(self.llm, user_request, generated_plan)
+
+    def _judge(self, llm, user_request: str, generated_plan):
+        """One judge call with `llm`; returns None on failure."""
+        formatted_plan = self._format_plan(generated_plan)
+        metrics = get_instrumentation()
         
-        try:
-            # Invoke the chain
-            result = chain.invoke({
-                "input": user_request,
-                "output": formatted_plan,
-                "format_instructions": self.parser.get_format_instructions()
-            })
-            return result
-        except Exception as e:
-            print(f"Failed to evaluate or parse: {e}")
+        with metrics.stage("evaluator.evaluate", config.PRIMARY_PROVIDER):
+            try:
+                # Prompt -> LLM -> parser, timed stage by stage
+                with metrics.stage("evaluator.format", config.PRIMARY_PROVIDER):
+                    messages = self.prompt.format_messages(
+                        input=user_request,
+                        output=formatted_plan,
+                        format_instructions=self.format_instructions
+                    )
+                with metrics.stage("evaluator.llm", config.PRIMARY_PROVIDER) as span:
+                    response = llm.invoke(messages)
+                    span["usage"] = response
+                with metrics.stage("evaluator.parse", config.PRIMARY_PROVIDER):
+                    result = self.parser.invoke(response)
+                return result
+            except Exception as e:
+                print(f"Failed to evaluate or parse: {e}")
+                return None
+
+    def evaluate_consistent(
+        self,
+        user_request: str,
+        generated_plan: list,
+        max_samples: int = None,
+        tolerance: float = None,
+        temperature: float = None,
+    ):
+        """
+        Judge a plan with as many samples as its score needs.
+
+        The judge is sampled at `temperature` (default: the evaluator's temperature,
+        or config.EVAL_SAMPLE_TEMPERATURE if it has none). A first score outside the
+        ambiguous band (config.EVAL_AMBIGUOUS_LOW/HIGH) is accepted as is; otherwise
+        sampling continues while the running variance of `overall` is above
+        `tolerance` (config.EVAL_VARIANCE_TOLERANCE), up to `max_samples`
+        (config.EVAL_MAX_SAMPLES).
+
+        Returns a ConsistentEvaluationResult (per-field means, spread of `overall`
+        and number of samples), or None if no sample could be parsed.
+        """
+        if not generated_plan:
+            return ConsistentEvaluationResult(
+                relevance=0, completeness=0, clarity=0, actionability=0, overall=0, spread=0, samples=0
+            )
+
+        settled = self._prescreened(user_request, generated_plan)
+        if settled is not None:
+            return ConsistentEvaluationResult(**settled.model_dump(), spread=0, samples=0)
+
+        max_samples = max_samples or config.EVAL_MAX_SAMPLES
+        tolerance = config.EVAL_VARIANCE_TOLERANCE if tolerance is None else tolerance
+        if temperature is None:
+            temperature = self.temperature if self.temperature is not None else config.EVAL_SAMPLE_TEMPERATURE
+        llm = get_chat_model(model_name=self.model_name, temperature=temperature)
+
+        samples = []
+        mean = m2 = 0.0   # Welford running mean / sum of squared deviations of `overall`
+        attempts = 0
+
+        with get_instrumentation().stage("evaluator.evaluate_consistent", config.PRIMARY_PROVIDER) as span:
+            while attempts < max_samples:
+                attempts += 1
+                result = self._judge(llm, user_request, generated_plan)
+                if result is None:
+                    if attempts < max_samples:
+                        # The failed judge call is repeated
+                        span["retries"] += 1
+                    continue
+
+                samples.append(result)
+                delta = result.overall - mean
+                mean += delta / len(samples)
+                m2 += delta * (result.overall - mean)
+
+                if len(samples) == 1:
+                    if not config.EVAL_AMBIGUOUS_LOW <= result.overall <= config.EVAL_AMBIGUOUS_HIGH:
+                        break
+                elif m2 / (len(samples) - 1) <= tolerance:
+                    break
+
+            span["samples"] = len(samples)
+
+        if not samples:
             return None
 
+        fields = ["relevance", "completeness", "clarity", "actionability", "overall"]
+        averaged = {name: sum(getattr(s, name) for s in samples) / len(samples) for name in fields}
+        spread = (m2 / (len(samples) - 1)) ** 0.5 if len(samples) > 1 else 0.0
+        return ConsistentEvaluationResult(**averaged, spread=spread, samples=len(samples))
+
+    def evaluate_many(
+        self,
+        items: list,
+        max_plans_per_request: int = None,
+        max_chars_per_request: int = None,
+        max_concurrency: int = None,
+    ):
+        """
+        Evaluate many (user_request, generated_plan) pairs with few judge calls.
+
+        Plans are packed into shared judge prompts of at most `max_plans_per_request`
+        plans and `max_chars_per_request` characters. Any plan whose entry is missing
+        or malformed in the batched answer is re-judged on its own prompt, again with
+        at most `max_concurrency` judge calls in flight.
+
+        Limits default to config.EVAL_BATCH_SIZE, EVAL_BATCH_MAX_CHARS and EVAL_MAX_CONCURRENCY.
+
+        Returns a list of EvaluationResult (or None on failure) in input order.
+        """
+        max_plans_per_request = max_plans_per_request or config.EVAL_BATCH_SIZE
+        max_chars_per_request = max_chars_per_request or config.EVAL_BATCH_MAX_CHARS
+        max_concurrency = max_concurrency or config.EVAL_MAX_CONCURRENCY
+
+        results = [None] * len(items)
+        chunks = []
+        current, current_chars = [], 0
+
+        for i, (user_request, generated_plan) in enumerate(items):
+            if not generated_plan:
+                results[i] = EvaluationResult(relevance=0, completeness=0, clarity=0, actionability=0, overall=0)
+                continue
+
+            settled = self._prescreened(user_request, generated_plan)
+            if settled is not None:
+                results[i] = settled
+                continue
+
+            block = BATCH_PLAN_TEMPLATE.format(
+                index=len(current) + 1,
+                input=user_request,
+                output=self._format_plan(generated_plan),
+            )
+            if current and (len(current) >= max_plans_per_request or current_chars + len(block) > max_chars_per_request):
+                chunks.append(current)
+                current, current_chars = [], 0
+                block = BATCH_PLAN_TEMPLATE.format(index=1, input=user_request, output=self._format_plan(generated_plan))
+
+            current.append((i, block))
+            current_chars += len(block)
+
+        if current:
+            chunks.append(current)
+
+        if not chunks:
+            return results
+
+        with get_instrumentation().stage("evaluator.evaluate_many", config.PRIMARY_PROVIDER) as span:
+            responses = self.batch_chain.batch(
+                [
+                    {
+                        "plans": "\n".join(block for _, block in chunk),
+                        "format_instructions": self.batch_format_instructions,
+                    }
+                    for chunk in chunks
+                ],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+
+            retry = []
+            for chunk, response in zip(chunks, responses):
+                parsed = self._parse_batch(response, len(chunk))
+                for position, (i, _) in enumerate(chunk, 1):
+                    if position in parsed:
+                        results[i] = parsed[position]
+                    else:
+                        retry.append(i)
+
+            # Re-judge missing or malformed entries individually, with the same concurrency bound
+            if retry:
+                print(f"Re-judging {len(retry)} plan(s) individually")
+                span["retries"] = len(retry)
+                rejudged = self.chain.batch(
+                    [
+                        {
+                            "input": items[i][0],
+                            "output": self._format_plan(items[i][1]),
+                            "format_instructions": self.format_instructions,
+                        }
+                        for i in retry
+                    ],
+                    config={"max_concurrency": max_concurrency},
+                    return_exceptions=True,
+                )
+                for i, result in zip(retry, rejudged):
+                    if isinstance(result, Exception):
+                        print(f"Failed to evaluate or parse: {result}")
+                        continue
+                    results[i] = result
+
+        return results
+
+    @staticmethod
+    def _parse_batch(response, size: int):
+        """
+        Map plan numbers (1-based) to EvaluationResult for every well-formed entry.
+        """
+        if isinstance(response, Exception):
+            print(f"Failed to evaluate batch: {response}")
+            return {}
+
+        entries = response.get("results", []) if isinstance(response, dict) else response
+        if not isinstance(entries, list):
+            return {}
+
+        parsed = {}
+        for entry in entries:
+            try:
+                scored = IndexedEvaluationResult.model_validate(entry)
+            except ValidationError:
+                continue
+            if 1 <= scored.index <= size and scored.index not in parsed:
+                parsed[scored.index] = EvaluationResult(**scored.model_dump(exclude={"index"}))
+        return parsed
+
 if __name__ == "__main__":
     evaluator = PlanEvaluator()
     
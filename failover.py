@@ -0,0 +1,292 @@
+# agent/failover.py
+
+"""
+Hedged requests and latency-based failover across LLM providers.
+
+A HedgedChatModel wraps an ordered chain of chat models (e.g. Groq -> OpenAI ->
+Anthropic). The first provider gets the request; if it has not answered within
+the hedge delay (a configured latency, or its own rolling p95 if lower), the
+same request is also sent to the next provider, and the first good answer wins.
+Errors fail over to the next provider immediately. Per-provider health stats
+(latency and error rate over a recent time window) decide the order of the chain,
+and providers that stopped getting traffic are probed in the background now and
+then so they can win their place back once they recover.
+
+Enable it with LLM_PROVIDER_CHAIN, e.g. "groq,openai,anthropic".
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agent import config
+from agent.instrumentation import get_instrumentation
+
+# Shared pool for in-flight provider calls (losing hedges finish in the background)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+class ProviderHealth:
+    """
+    Latency and error statistics for one provider over the last `window_seconds`
+    (at most `window` samples). Older outcomes age out, so a provider that had
+    an outage is judged on how it behaves now.
+    """
+
+    def __init__(self, window: int = 200, window_seconds: float = None):
+        self.window_seconds = window_seconds
+        self.latencies = deque(maxlen=window)  # (timestamp, seconds)
+        self.outcomes = deque(maxlen=window)   # (timestamp, True = success / False = error)
+        self.last_called = time.monotonic()   # Idle time for probes counts from creation
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        window = self.window_seconds if self.window_seconds is not None else config.HEDGE_HEALTH_WINDOW_SECONDS
+        cutoff = time.monotonic() - window
+        for samples in (self.latencies, self.outcomes):
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+
+    def record_success(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            self.latencies.append((now, seconds))
+            self.outcomes.append((now, True))
+            self.last_called = now
+
+    def record_error(self):
+        with self._lock:
+            now = time.monotonic()
+            self.outcomes.append((now, False))
+            self.last_called = now
+
+    def claim_probe(self, interval: float) -> bool:
+        """
+        True (at most once per `interval`) when the provider has not been called
+        for `interval` seconds; the caller should then send it a probe.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if interval <= 0 or (self.last_called is not None and now - self.last_called < interval):
+                return False
+            # Count the probe as a call now so concurrent requests do not probe too
+            self.last_called = now
+            return True
+
+    def p95(self):
+        """p95 latency over the window, or None until enough samples were seen."""
+        with self._lock:
+            self._prune()
+            if len(self.latencies) < config.HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(seconds for _, seconds in self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self) -> float:
+        """Error rate over the window, or 0.0 until enough outcomes were seen."""
+        with self._lock:
+            self._prune()
+            if len(self.outcomes) < config.HEDGE_MIN_SAMPLES:
+                return 0.0
+            return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def score(self, neutral_latency: float = 1.0) -> float:
+        """
+        Lower is healthier: p95 latency inflated by the error rate.
+        Until the p95 is known, `neutral_latency` stands in for it.
+        """
+        p95 = self.p95()
+        latency = p95 if p95 is not None else neutral_latency
+        return latency * (1.0 + 10.0 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        p95, error_rate = self.p95(), self.error_rate()
+        with self._lock:
+            samples = len(self.outcomes)
+        return {"p95": p95, "error_rate": error_rate, "samples": samples}
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_health(provider: str) -> ProviderHealth:
+    """Return the process-wide health stats for a provider."""
+    with _health_lock:
+        if provider not in _health:
+            _health[provider] = ProviderHealth()
+        return _health[provider]
+
+
+def health_report() -> dict:
+    """Health snapshot of every provider seen so far."""
+    with _health_lock:
+        providers = list(_health.items())
+    return {name: health.snapshot() for name, health in providers}
+
+
+class AllProvidersFailed(RuntimeError):
+    """Raised when every provider in the chain returned an error."""
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model that hedges and fails over across an ordered provider chain.
+    """
+
+    models: List[Any]
+    providers: List[str]
+    hedge_after: Optional[float] = None   # Seconds; None uses config.HEDGE_AFTER_SECONDS
+    reorder: bool = True                  # Order the chain by provider health
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    def _ordered(self):
+        chain = list(zip(self.providers, self.models))
+        if self.reorder:
+            # Providers without a p95 yet are ranked at the median known p95, so an
+            # untried provider neither jumps ahead of nor falls behind a healthy one
+            known = sorted(p95 for p95 in (get_health(p).p95() for p in self.providers) if p95 is not None)
+            neutral = known[len(known) // 2] if known else 1.0
+            # sorted() is stable: equal scores keep the configured order
+            chain.sort(key=lambda item: get_health(item[0]).score(neutral))
+        return chain
+
+    def _hedge_delay(self, provider: str) -> float:
+        delay = self.hedge_after if self.hedge_after is not None else config.HEDGE_AFTER_SECONDS
+        p95 = get_health(provider).p95()
+        return min(delay, p95) if p95 is not None else delay
+
+    @classmethod
+    def _probe(cls, provider: str, model, messages, stop):
+        """Background call that only feeds the provider's health stats."""
+        try:
+            cls._call(provider, model, messages, stop)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _call(provider: str, model, messages, stop):
+        health = get_health(provider)
+        start = time.perf_counter()
+        try:
+            message = model.invoke(messages, stop=stop)
+        except Exception:
+            health.record_error()
+            raise
+        health.record_success(time.perf_counter() - start)
+        return message
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        started = time.perf_counter()
+        chain = self._ordered()
+        if self.reorder:
+            # Demoted providers rarely see traffic: probe idle ones so their stats stay current
+            for provider, model in chain[1:]:
+                if get_health(provider).claim_probe(config.HEDGE_PROBE_SECONDS):
+                    _executor.submit(contextvars.copy_context().run, self._probe, provider, model, messages, stop)
+
+        in_flight = {}
+        errors = []
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            provider, model = chain[next_index]
+            next_index += 1
+            # Run in a copy of the caller's context so the scheduler lane (interactive/bulk) carries over
+            context = contextvars.copy_context()
+            in_flight[_executor.submit(context.run, self._call, provider, model, messages, stop)] = provider
+            return provider
+
+        last_launched = launch()
+
+        while in_flight:
+            # Wait for an answer, or hedge once the most recent request is slow
+            timeout = self._hedge_delay(last_launched) if next_index < len(chain) else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                last_launched = launch()
+                continue
+
+            for future in done:
+                provider = in_flight.pop(future)
+                try:
+                    message = future.result()
+                except Exception as e:
+                    errors.append(f"{provider}: {type(e).__name__}: {e}")
+                    # Fail over immediately instead of waiting out the hedge delay
+                    if next_index < len(chain):
+                        last_launched = launch()
+                    continue
+
+                # Each failed-over provider error counts as a retry (hedges do not)
+                get_instrumentation().record(
+                    "failover.generate", time.perf_counter() - started, provider, retries=len(errors)
+                )
+                return ChatResult(
+                    generations=[ChatGeneration(message=message, generation_info={"provider": provider})],
+                )
+
+        get_instrumentation().record(
+            "failover.generate", time.perf_counter() - started, retries=max(0, len(errors) - 1), error=True
+        )
+        raise AllProvidersFailed("; ".join(errors))
+
+
+def build_hedged_model(providers: list, model_name: str = None, temperature: float = None):
+    """
+    Build a HedgedChatModel over shared registry models for `providers`.
+    `model_name` applies to the primary provider; the others use their default model.
+    """
+    from agent.config import get_llm, get_provider
+
+    primary = get_provider()
+    models = [
+        get_llm(provider=provider, model_name=model_name if provider == primary else None, temperature=temperature)
+        for provider in providers
+    ]
+    return HedgedChatModel(models=models, providers=list(providers))
+
+
+# -----------------------------
+# Demo with local stub providers
+# -----------------------------
+if __name__ == "__main__":
+    from langchain_core.messages import HumanMessage
+    from agent.stub_llm import StubChatModel
+
+    slow = StubChatModel(latency=1.0)
+    flaky = StubChatModel(latency=0.05, error_rate=0.5)
+    fast = StubChatModel(latency=0.1)
+
+    hedged = HedgedChatModel(
+        models=[slow, flaky, fast],
+        providers=["slow", "flaky", "fast"],
+        hedge_after=0.2,
+    )
+
+    prompt = [HumanMessage(content="Current TODO:\nSet up project")]
+    for i in range(30):
+        start = time.perf_counter()
+        result = hedged.generate([prompt])
+        provider = result.generations[0][0].generation_info["provider"]
+        print(f"request {i + 1}: answered by {provider} in {time.perf_counter() - start:.2f}s")
+
+    print("Health:", health_report())
@@ -1,24 +1,184 @@
 # graph/graph.py
 
-from agent.planner import plan_task
+import hashlib
+import os
+import sqlite3
+import uuid
 
-def build_graph():
+from agent import config
+from agent.state import AgentState
+
+
+def _task_from(state: dict) -> str:
+    """Accept either {"task": ...} or the LangSmith {"messages": [...]} shape."""
+    if state.get("task"):
+        return state["task"]
+    return state.get("messages", [{}])[0].get("content", "")
+
+
+def thread_id_for(task: str, execute: bool = True, evaluate: bool = True) -> str:
+    """
+    New checkpoint thread for one run of `task` under a graph configuration.
+    The prefix identifies the task and configuration; the suffix is unique per run.
+    """
+    key = f"{task}\x00execute={execute}\x00evaluate={evaluate}"
+    return f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}-{uuid.uuid4().hex[:8]}"
+
+
+# -----------------------------
+# Nodes
+# -----------------------------
+def plan_node(state: AgentState):
+    from agent.planner import TaskPlanner
+    todos = TaskPlanner().generate_todo(state["task"])
+    return {"todos": todos, "step": 0, "observations": []}
+
+
+def execute_step_node(state: AgentState):
+    """Run the next TODO with a ReAct session rebuilt from the checkpointed observations."""
+    from agent.react_loop import ReactSession
+
+    step = state.get("step", 0)
+    todos = state["todos"]
+    observations = list(state.get("observations", []))
+
+    session = ReactSession(state["task"])
+    session.restore(todos[:step], observations)
+
+    observations.append(session.step(todos[step]))
+    return {"step": step + 1, "observations": observations}
+
+
+def evaluate_node(state: AgentState):
+    from agent.evaluators import PlanEvaluator
+    result = PlanEvaluator().evaluate(state["task"], state.get("todos", []))
+    return {
+        "evaluation": result.model_dump() if result is not None else None,
+        "final_output": "\n\n".join(state.get("observations", [])),
+    }
+
+
+def _after_plan(state: AgentState, execute: bool, evaluate: bool):
+    if execute and state.get("todos"):
+        return "execute_step"
+    return "evaluate" if evaluate else "end"
+
+
+def _after_step(state: AgentState, evaluate: bool):
+    if state.get("step", 0) < len(state.get("todos", [])):
+        return "execute_step"
+    return "evaluate" if evaluate else "end"
+
+
+# -----------------------------
+# Graph
+# -----------------------------
+class AgentGraph:
     """
-    Builds a simple agent graph for LangSmith experiments.
-    Invoking the graph generates TODO steps for a task.
+    Compiled LangGraph over AgentState: plan -> execute_step (one node per TODO) -> evaluate.
+
+    With checkpointing on, every node's output is saved to SQLite under the run's
+    thread id. Each call runs under a new thread unless the caller passes a
+    `thread_id`; passing the id of an interrupted run resumes it from the last
+    finished node instead of re-planning and re-running earlier TODOs.
     """
-    # The 'invoke' method simulates the agent receiving a state with messages
-    def invoke(self, state):
+
+    def __init__(self, compiled, checkpointer, execute: bool = True, evaluate: bool = True):
+        self.compiled = compiled
+        self.checkpointer = checkpointer
+        self.execute = execute
+        self.evaluate = evaluate
+
+    @staticmethod
+    def _config(thread_id: str = None):
+        # One super-step per TODO, so allow long plans
+        run_config = {"recursion_limit": 1000}
+        if thread_id is not None:
+            run_config["configurable"] = {"thread_id": thread_id}
+        return run_config
+
+    def invoke(self, state, thread_id: str = None):
+        """
+        state: {"task": ...} or a dict with "messages" key (list of {"role": ..., "content": ...})
+        thread_id: checkpoint thread to run under; resumes it if it holds an interrupted run of the task
+        Returns the final AgentState (a dict with "todos", "observations", "evaluation", ...),
+        plus the "thread_id" it ran under when checkpointing is on.
+        """
+        task = _task_from(state)
+        if self.checkpointer is None:
+            return self.compiled.invoke({"task": task}, self._config())
+
+        if thread_id is None:
+            thread_id = thread_id_for(task, self.execute, self.evaluate)
+        else:
+            # Resume an interrupted run of this task from its last checkpoint
+            snapshot = self.compiled.get_state(self._config(thread_id))
+            if snapshot.next and snapshot.values.get("task") == task:
+                print(f"🔁 Resuming '{task}' at {', '.join(snapshot.next)}")
+                return {**self.compiled.invoke(None, self._config(thread_id)), "thread_id": thread_id}
+
+        return {**self.compiled.invoke({"task": task}, self._config(thread_id)), "thread_id": thread_id}
+
+    def batch(self, states, max_concurrency=None, thread_ids=None):
         """
-        state: dict with "messages" key (list of {"role": ..., "content": ...})
-        Returns a dict with "todos" key containing list of steps
+        states: list of dicts shaped like the `invoke` input
+        thread_ids: optional list of checkpoint threads, one per state (None entries start a new run)
+        Returns one state dict per input, in order.
+        A failed task gets empty todos plus an "error" message instead of failing the batch.
         """
-        user_input = state.get("messages", [{}])[0].get("content", "")
-        todos = plan_task(user_input)
-        return {"todos": todos}
+        from langchain_core.runnables import RunnableLambda
+
+        max_concurrency = max_concurrency or config.PLANNER_MAX_CONCURRENCY
+        thread_ids = thread_ids or [None] * len(states)
+        results = RunnableLambda(lambda item: self.invoke(item[1], thread_id=item[0])).batch(
+            list(zip(thread_ids, states)),
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        return [
+            {"todos": [], "error": str(result)} if isinstance(result, Exception) else result
+            for result in results
+        ]
+
 
-    return type("AgentGraph", (), {"invoke": invoke})()
+def build_graph(execute: bool = True, evaluate: bool = True, checkpoint_path: str = None, checkpoint: bool = True):
+    """
+    Builds the agent graph.
+
+    Args:
+        execute (bool): Run every TODO through the ReAct loop after planning
+        evaluate (bool): Score the plan with PlanEvaluator at the end
+        checkpoint_path (str): SQLite checkpoint file, default config.GRAPH_CHECKPOINT_PATH
+        checkpoint (bool): Save node outputs so interrupted runs can resume
+
+    Returns:
+        AgentGraph: compiled graph with `invoke` and `batch`
+    """
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.checkpoint.sqlite import SqliteSaver
 
+    graph = StateGraph(AgentState)
+    graph.add_node("plan", plan_node)
+    graph.add_node("execute_step", execute_step_node)
+    graph.add_node("evaluate", evaluate_node)
 
+    graph.add_edge(START, "plan")
+    graph.add_conditional_edges(
+        "plan",
+        lambda state: _after_plan(state, execute, evaluate),
+        {"execute_step": "execute_step", "evaluate": "evaluate", "end": END},
+    )
+    graph.add_conditional_edges(
+        "execute_step",
+        lambda state: _after_step(state, evaluate),
+        {"execute_step": "execute_step", "evaluate": "evaluate", "end": END},
+    )
+    graph.add_edge("evaluate", END)
 
+    checkpointer = None
+    if checkpoint:
+        path = checkpoint_path or config.GRAPH_CHECKPOINT_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        checkpointer = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
 
+    return AgentGraph(graph.compile(checkpointer=checkpointer), checkpointer, execute, evaluate)
@@ -0,0 +1,334 @@
+# agent/heuristics.py
+
+"""
+Deterministic pre-scoring of plans, in front of the LLM judge.
+
+Cheap local checks settle the clear-cut cases:
+- step count (a one-step "plan" is not a plan)
+- exact and near-duplicate steps (character 3-gram Jaccard, as in agent.similarity)
+- the action-verb rule from TASK_PLANNER_PROMPT (a soft feature: the verb list
+  is not exhaustive, so it only lowers actionability)
+- overlap between the task's terms and the plan, and steps that only repeat the task
+
+With EVAL_PRESCREEN=true, plans whose heuristic score falls below
+EVAL_PRESCREEN_LOW (or that break a hard rule) get a calibrated score without a
+judge call; with EVAL_PRESCREEN_HIGH set, so do plans above it. Only the
+uncertain middle band goes to the LLM judge.
+
+Calibrate against the judge on a held-out set (JSONL lines {"task": ..., "plan": [...]}):
+    python -m agent.heuristics calibrate held_out.jsonl --output .cache/prescreen.json
+"""
+
+import argparse
+import json
+import os
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+from agent import config
+from agent.similarity import shingles, jaccard
+
+# Common imperative verbs; steps starting with one count towards actionability
+ACTION_VERBS = frozenset("""
+add adjust allocate analyze apply arrange assemble assess assign audit automate back backup
+book brainstorm build buy calculate check choose clean collect compare compile complete
+compose conduct configure confirm connect consolidate contact create customize debug decide
+define delegate deliver deploy describe design determine develop diagnose document download
+draft edit enable establish estimate evaluate execute explore export fill finalize find fix
+follow gather generate get go hire host identify implement import improve install integrate
+interview invite launch learn list load locate log maintain make map measure migrate model
+monitor move negotiate note notify obtain open optimize order organize outline pack perform
+pick plan practice prepare present prioritize process procure produce profile prototype
+provision publish purchase put read record refactor refine register release remove rent
+repair replace report request research reserve resolve restore review revise run save
+schedule scope search secure select send set setup share shortlist sign simplify sketch
+source specify split start study submit summarize survey take teach test track train
+transfer translate tune update upgrade upload use validate verify visit wireframe write
+""".split())
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in into is it its me my of on or our
+so that the their them this to up using want we what when which will with you your
+""".split())
+
+# Steps this similar to each other (or to the task) count as near-duplicates
+NEAR_DUPLICATE = 0.8
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class PrescreenResult(NamedTuple):
+    scores: dict            # Heuristic relevance / completeness / clarity / actionability / overall
+    decision: str           # "fail", "pass" or "uncertain"
+    reasons: List[str]      # Hard rules that fired
+
+
+def _words(text: str) -> list:
+    return _WORD.findall(text.lower())
+
+
+def _terms(text: str) -> set:
+    # Content words, cut to a 5-letter prefix as a crude stemmer ("deploying" ~ "deploy")
+    return {word[:5] for word in _words(text) if len(word) > 2 and word not in STOPWORDS}
+
+
+def _starts_with_verb(step: str) -> bool:
+    words = _words(step)
+    return bool(words) and words[0] in ACTION_VERBS
+
+
+def score_plan(task: str, steps: list) -> dict:
+    """Heuristic scores (0.0 - 1.0) plus the raw features they are built from."""
+    steps = [str(step).strip() for step in steps if str(step).strip()]
+    n = len(steps)
+    if n == 0:
+        return {"relevance": 0.0, "completeness": 0.0, "clarity": 0.0, "actionability": 0.0, "overall": 0.0,
+                "steps": 0, "duplicates": 0, "near_duplicates": 0, "parroted": 0, "verb_ratio": 0.0, "overlap": 0.0}
+
+    normalized = [" ".join(_words(step)) for step in steps]
+    duplicates = n - len(set(normalized))
+
+    step_shingles = [shingles(step) for step in steps]
+    task_shingles = shingles(task)
+    near_duplicates = 0
+    checked = min(n, 50)   # Pairwise check is quadratic; long plans are sampled from the top
+    for i in range(1, checked):
+        if normalized[i] in normalized[:i]:
+            continue
+        if any(jaccard(step_shingles[i], step_shingles[j]) >= NEAR_DUPLICATE for j in range(i)):
+            near_duplicates += 1
+    parroted = sum(1 for s in step_shingles if jaccard(s, task_shingles) >= NEAR_DUPLICATE)
+
+    verb_ratio = sum(1 for step in steps if _starts_with_verb(step)) / n
+    task_terms = _terms(task)
+    plan_terms = _terms(" ".join(steps))
+    overlap = len(task_terms & plan_terms) / len(task_terms) if task_terms else 1.0
+
+    if n == 1:
+        step_count = 0.0
+    elif n == 2:
+        step_count = 0.5
+    elif n <= 30:
+        step_count = 1.0
+    else:
+        step_count = 0.7   # Very long plans tend to be padded
+
+    relevance = overlap * (1 - parroted / n)
+    completeness = step_count * (1 - duplicates / n)
+    clarity = 1 - min(1.0, (duplicates + near_duplicates + parroted) / n)
+    actionability = verb_ratio
+
+    scores = {
+        "relevance": relevance,
+        "completeness": completeness,
+        "clarity": clarity,
+        "actionability": actionability,
+    }
+    scores["overall"] = sum(scores.values()) / 4
+    scores.update({
+        "steps": n, "duplicates": duplicates, "near_duplicates": near_duplicates,
+        "parroted": parroted, "verb_ratio": verb_ratio, "overlap": overlap,
+    })
+    return scores
+
+
+SCORE_FIELDS = ["relevance", "completeness", "clarity", "actionability", "overall"]
+
+IDENTITY = {"slope": 1.0, "intercept": 0.0}
+
+
+@lru_cache(maxsize=None)
+def load_calibration(path: str = None) -> dict:
+    """
+    Per-field linear maps from heuristic to judge scores, fitted by `calibrate`:
+    {field: {"slope": ..., "intercept": ...}}. Fields without a map (all of
+    them when no calibration file is configured) keep their heuristic score.
+    """
+    path = path or config.EVAL_PRESCREEN_CALIBRATION
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # Older files hold a single line, fitted on `overall` only
+        return {"overall": data} if "slope" in data else data
+    return {}
+
+
+def calibrated(value: float, calibration: dict = None, field: str = "overall") -> float:
+    calibration = load_calibration() if calibration is None else calibration
+    line = calibration.get(field, IDENTITY)
+    return round(min(1.0, max(0.0, line["slope"] * value + line["intercept"])), 2)
+
+
+def prescreen(task: str, steps: list, low: float = None, high: float = None) -> PrescreenResult:
+    """
+    Score a plan locally and decide whether the LLM judge is needed.
+    """
+    low = config.EVAL_PRESCREEN_LOW if low is None else low
+    high = config.EVAL_PRESCREEN_HIGH if high is None else high
+    scores = score_plan(task, steps)
+
+    reasons = []
+    n = scores["steps"]
+    if n <= 1:
+        reasons.append("single step")
+    elif scores["duplicates"] * 2 >= n:
+        reasons.append("mostly duplicated steps")
+    if n and scores["parroted"] * 2 >= n:
+        reasons.append("steps repeat the task")
+
+    if reasons:
+        # A broken rule caps the score, however well the other checks did
+        scores["overall"] = min(scores["overall"], low)
+        decision = "fail"
+    elif scores["overall"] <= low:
+        decision = "fail"
+    elif high is not None and scores["overall"] >= high:
+        decision = "pass"
+    else:
+        decision = "uncertain"
+    return PrescreenResult(scores=scores, decision=decision, reasons=reasons)
+
+
+def to_evaluation(result: PrescreenResult):
+    """Calibrated EvaluationResult for a settled prescreen result."""
+    from agent.evaluators import EvaluationResult
+
+    return EvaluationResult(**{name: calibrated(result.scores[name], field=name) for name in SCORE_FIELDS})
+
+
+# -----------------------------
+# Calibration against the judge
+# -----------------------------
+def fit_calibration(heuristic: list, judge: list) -> dict:
+    """Least-squares line judge ~ slope * heuristic + intercept."""
+    n = len(heuristic)
+    mean_h = sum(heuristic) / n
+    mean_j = sum(judge) / n
+    var_h = sum((h - mean_h) ** 2 for h in heuristic)
+    if not var_h:
+        return {"slope": 0.0, "intercept": mean_j}
+    slope = sum((h - mean_h) * (j - mean_j) for h, j in zip(heuristic, judge)) / var_h
+    return {"slope": slope, "intercept": mean_j - slope * mean_h}
+
+
+def fit_calibrations(heuristic: list, judged: list) -> dict:
+    """One calibration line per score field; `heuristic` holds score_plan dicts, `judged` EvaluationResults."""
+    return {
+        field: fit_calibration([scores[field] for scores in heuristic], [getattr(result, field) for result in judged])
+        for field in SCORE_FIELDS
+    }
+
+
+def _agreement_pairs(items: list, judge_overall: list, calibration: dict = None) -> list:
+    pairs = []
+    for (task, steps), judged in zip(items, judge_overall):
+        if judged is None:
+            continue
+        result = prescreen(task, steps)
+        pairs.append((result, calibrated(result.scores["overall"], calibration), judged))
+    return pairs
+
+
+def agreement(items: list, judge_overall: list, calibration: dict = None) -> dict:
+    """
+    Compare prescreen scores with judge scores on a held-out set.
+
+    Returns the number of short-circuited cases, the mean absolute error and
+    correlation of calibrated overall scores, and, for the short-circuited
+    cases, the share within 0.15 of the judge.
+    """
+    return _summarize(_agreement_pairs(items, judge_overall, calibration))
+
+
+def _summarize(pairs: list) -> dict:
+    if not pairs:
+        return {"examples": 0}
+
+    predicted = [p for _, p, _ in pairs]
+    actual = [j for _, _, j in pairs]
+    errors = [abs(p - j) for p, j in zip(predicted, actual)]
+    settled = [(p, j) for result, p, j in pairs if result.decision != "uncertain"]
+
+    mean_p, mean_a = sum(predicted) / len(pairs), sum(actual) / len(pairs)
+    cov = sum((p - mean_p) * (a - mean_a) for p, a in zip(predicted, actual))
+    var_p = sum((p - mean_p) ** 2 for p in predicted)
+    var_a = sum((a - mean_a) ** 2 for a in actual)
+
+    return {
+        "examples": len(pairs),
+        "short_circuited": len(settled),
+        "mae": sum(errors) / len(errors),
+        "pearson": cov / (var_p * var_a) ** 0.5 if var_p and var_a else None,
+        "short_circuit_within_0.15": (
+            sum(1 for p, j in settled if abs(p - j) <= 0.15) / len(settled) if settled else None
+        ),
+    }
+
+
+def calibrate(path: str, output: Optional[str] = None, folds: int = 5) -> dict:
+    """
+    Judge every held-out plan with the LLM and fit the per-field calibration on all of them.
+
+    Agreement is reported on unseen plans only: the plans are split into `folds`
+    folds, and each fold is scored with a calibration fitted on the other folds.
+    """
+    from agent.evaluators import PlanEvaluator
+
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                items.append((record["task"], record.get("plan") or record.get("todos") or []))
+
+    judged = PlanEvaluator(prescreen=False).evaluate_many(items)
+
+    usable = [(item, score_plan(*item), result) for item, result in zip(items, judged) if result is not None]
+    if not usable:
+        raise ValueError("The judge scored none of the held-out plans")
+    calibration = fit_calibrations([scores for _, scores, _ in usable], [result for _, _, result in usable])
+
+    folds = min(folds, len(usable))
+    pairs = []
+    if folds >= 2:
+        for k in range(folds):
+            train = [u for i, u in enumerate(usable) if i % folds != k]
+            test = [u for i, u in enumerate(usable) if i % folds == k]
+            fold_calibration = fit_calibrations([scores for _, scores, _ in train], [result for _, _, result in train])
+            pairs += _agreement_pairs(
+                [item for item, _, _ in test], [result.overall for _, _, result in test], fold_calibration
+            )
+    report = {**_summarize(pairs), "folds": folds if folds >= 2 else 0}
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(calibration, f, indent=2)
+        print(f"📄 Calibration written to {output}")
+    return {"calibration": calibration, "agreement": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heuristic plan pre-scoring")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = commands.add_parser("calibrate", help="Fit and check the calibration on a held-out set")
+    calibrate_parser.add_argument("held_out", help="JSONL file of {\"task\": ..., \"plan\": [...]} lines")
+    calibrate_parser.add_argument("--output", help="Where to write the calibration JSON")
+    calibrate_parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for the agreement report")
+
+    score_parser = commands.add_parser("score", help="Prescreen one plan")
+    score_parser.add_argument("task")
+    score_parser.add_argument("steps", nargs="+")
+
+    args = parser.parse_args()
+    if args.command == "calibrate":
+        config.load_env()
+        print(json.dumps(calibrate(args.held_out, args.output, folds=args.folds), indent=2))
+    else:
+        print(json.dumps(prescreen(args.task, args.steps)._asdict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# agent/incremental.py
+
+"""
+Incremental experiment re-runs.
+
+Every example's planner output and judge score is stored under a fingerprint of
+everything that can change it. A new run only recomputes the stages whose
+fingerprint changed (new input, edited prompt, different provider/model/temperature)
+and reuses the rest.
+
+Enable it by setting INCREMENTAL_STORE_PATH (e.g. ".cache/experiments.sqlite").
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from agent import config
+from agent.config import get_model_name
+
+
+# -----------------------------
+# Fingerprints
+# -----------------------------
+def _digest(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def planner_fingerprint(user_input: str) -> str:
+    """Fingerprint of the planning stage: input, planner prompt and planner model settings."""
+    from agent.prompts import TASK_PLANNER_PROMPT
+
+    return _digest("planner", user_input, TASK_PLANNER_PROMPT, config.PRIMARY_PROVIDER, get_model_name(), config.PLANNER_TEMPERATURE)
+
+
+def judge_fingerprint(user_request: str, generated_plan) -> str:
+    """
+    Fingerprint of the judging stage: input, the plan being judged, the evaluator
+    template and judge model settings. A changed plan therefore re-triggers judging.
+    """
+    from agent.evaluators import EVALUATION_PROMPT_TEMPLATE
+
+    # The judge uses the provider's default temperature (see PlanEvaluator);
+    # heuristic pre-scoring settings decide which plans reach it
+    prescreen = (config.EVAL_PRESCREEN, config.EVAL_PRESCREEN_LOW, config.EVAL_PRESCREEN_HIGH, config.EVAL_PRESCREEN_CALIBRATION)
+    return _digest("judge", user_request, generated_plan, EVALUATION_PROMPT_TEMPLATE, config.PRIMARY_PROVIDER, get_model_name(), None, prescreen)
+
+
+# -----------------------------
+# Store
+# -----------------------------
+class IncrementalStore:
+    """
+    SQLite store of stage results keyed by fingerprint, plus a per-run usage log
+    used to report how many stages were recomputed and how many were reused.
+    """
+
+    def __init__(self, path: str, run_id: str = None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stages (
+                fingerprint TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                reused INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS usage_run ON usage (run_id)")
+
+    def _connect(self):
+        """Return a per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, fingerprint: str):
+        row = self._connect().execute(
+            "SELECT value FROM stages WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, stage: str, fingerprint: str, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO stages (fingerprint, stage, value, created_at) VALUES (?, ?, ?, ?)",
+            (fingerprint, stage, json.dumps(value, ensure_ascii=False, default=str), time.time()),
+        )
+
+    def _log(self, stage: str, fingerprint: str, reused: bool):
+        self._connect().execute(
+            "INSERT INTO usage (run_id, stage, fingerprint, reused, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self.run_id, stage, fingerprint, int(reused), time.time()),
+        )
+
+    def cached(self, stage: str, fingerprint: str, compute):
+        """
+        Return the stored value for `fingerprint`, or run `compute()` and store it.
+        A None result is returned but not stored, so failures are retried next run.
+        """
+        value = self.get(fingerprint)
+        if value is not None:
+            self._log(stage, fingerprint, reused=True)
+            return value
+
+        value = compute()
+        if value is not None:
+            self.put(stage, fingerprint, value)
+        self._log(stage, fingerprint, reused=False)
+        return value
+
+    def report(self, run_id: str = None) -> dict:
+        """
+        Return {stage: {"recomputed": n, "reused": m}} for a run (default: this run).
+        """
+        rows = self._connect().execute(
+            "SELECT stage, reused, COUNT(*) FROM usage WHERE run_id = ? GROUP BY stage, reused",
+            (run_id or self.run_id,),
+        ).fetchall()
+
+        report = {}
+        for stage, reused, count in rows:
+            counts = report.setdefault(stage, {"recomputed": 0, "reused": 0})
+            counts["reused" if reused else "recomputed"] += count
+        return report
+
+
+def print_report(report: dict):
+    """Print a one-line-per-stage summary of an incremental run."""
+    print("🔁 Incremental run report:")
+    for stage, counts in sorted(report.items()):
+        print(f"   {stage}: {counts['recomputed']} recomputed, {counts['reused']} reused")
+
+
+# -----------------------------
+# Shared store instance
+# -----------------------------
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_incremental_store():
+    """
+    Return the process-wide IncrementalStore, or None when INCREMENTAL_STORE_PATH is not set.
+    Processes that share EXPERIMENT_RUN_ID (e.g. local_runner workers) log to the same run.
+    """
+    global _shared_store
+    if not config.INCREMENTAL_STORE_PATH:
+        return None
+
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = IncrementalStore(config.INCREMENTAL_STORE_PATH, run_id=os.getenv("EXPERIMENT_RUN_ID"))
+        return _shared_store
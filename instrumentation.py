@@ -0,0 +1,321 @@
+# agent/instrumentation.py
+
+"""
+Per-stage latency, token and cost instrumentation.
+
+Every instrumented stage (prompt formatting, LLM call, parsing, whole requests)
+records wall time, prompt/completion tokens, retries (calls repeated after a
+failure), samples (repeated calls made on purpose, e.g. extra judge samples),
+errors and an estimated cost. Latencies are kept as bounded histograms with p50/p95/p99 and can be
+exported as JSON or in Prometheus text format.
+
+Usage:
+    from agent.instrumentation import get_instrumentation
+    print(get_instrumentation().to_prometheus())
+
+Profile a single slow request:
+    python -m agent.instrumentation profile "Build a personal website" --mode cprofile
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import threading
+import time
+from collections import deque
+
+from agent import config
+
+# Estimated USD cost per 1M tokens: (prompt, completion). Local providers are free.
+COST_PER_MILLION_TOKENS = {
+    "groq": (0.59, 0.79),
+    "openai": (0.15, 0.60),
+    "anthropic": (3.00, 15.00),
+    "ollama": (0.0, 0.0),
+    "stub": (0.0, 0.0),
+}
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def estimate_cost(provider: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call for the given provider."""
+    prompt_rate, completion_rate = COST_PER_MILLION_TOKENS.get(provider, (0.0, 0.0))
+    return (prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1_000_000
+
+
+def usage_from(message):
+    """Return (prompt_tokens, completion_tokens) from a LangChain message's usage metadata."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+def nearest_rank(ordered: list, q: float) -> float:
+    """Nearest-rank percentile `q` (0.0 - 1.0) of an already sorted list."""
+    if not ordered:
+        return 0.0
+    # The small offset keeps float error (e.g. 0.07 * 100 = 7.000000000000001) from bumping the rank
+    rank = math.ceil(q * len(ordered) - 1e-9)
+    return ordered[min(len(ordered) - 1, max(0, rank - 1))]
+
+
+class Histogram:
+    """Latency samples for one stage (bounded to the most recent `max_samples`)."""
+
+    def __init__(self, max_samples: int = 10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q: float) -> float:
+        return nearest_rank(sorted(self.samples), q)
+
+
+class StageStats:
+    """Aggregated counters for one (stage, provider) pair."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.samples = 0
+        self.errors = 0
+        self.cost = 0.0
+
+    def to_dict(self) -> dict:
+        data = {
+            "count": self.latency.count,
+            "total_seconds": self.latency.total,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "samples": self.samples,
+            "errors": self.errors,
+            "estimated_cost_usd": round(self.cost, 6),
+        }
+        for q in PERCENTILES:
+            data[f"p{int(q * 100)}"] = self.latency.percentile(q)
+        return data
+
+
+class Instrumentation:
+    """
+    Thread-safe registry of stage statistics.
+    """
+
+    def __init__(self, enabled: bool = None):
+        # None: follow config.INSTRUMENTATION_ENABLED (read on first record)
+        self._enabled = enabled
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        provider: str = "",
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0,
+        error: bool = False,
+        samples: int = 0,
+    ):
+        """Record one completed stage."""
+        if self._enabled is None:
+            self._enabled = config.INSTRUMENTATION_ENABLED
+        if not self._enabled:
+            return
+
+        with self._lock:
+            stats = self._stats.setdefault((stage, provider), StageStats())
+            stats.latency.add(seconds)
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.retries += retries
+            stats.samples += samples
+            stats.errors += int(error)
+            stats.cost += estimate_cost(provider, prompt_tokens, completion_tokens)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, provider: str = ""):
+        """
+        Time a block of code as one stage.
+
+        Yields a dict the block can fill with "prompt_tokens", "completion_tokens",
+        "retries" and "samples" (or pass an LLM response to `span["usage"]`).
+        """
+        span = {"prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "samples": 0}
+        start = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            if "usage" in span:
+                span["prompt_tokens"], span["completion_tokens"] = usage_from(span.pop("usage"))
+            self.record(
+                name,
+                time.perf_counter() - start,
+                provider=provider,
+                prompt_tokens=span["prompt_tokens"],
+                completion_tokens=span["completion_tokens"],
+                retries=span["retries"],
+                error=error,
+                samples=span["samples"],
+            )
+
+    def token_totals(self):
+        """Return (prompt_tokens, completion_tokens) summed over all stages."""
+        with self._lock:
+            return (
+                sum(stats.prompt_tokens for stats in self._stats.values()),
+                sum(stats.completion_tokens for stats in self._stats.values()),
+            )
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    # -----------------------------
+    # Exporters
+    # -----------------------------
+    def snapshot(self) -> dict:
+        """Return {stage: {provider: stats}} as plain data."""
+        with self._lock:
+            data = {}
+            for (stage, provider), stats in sorted(self._stats.items()):
+                data.setdefault(stage, {})[provider or "none"] = stats.to_dict()
+            return data
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Render all stages in the Prometheus text exposition format."""
+        lines = [
+            "# HELP agent_stage_latency_seconds Wall time per agent stage.",
+            "# TYPE agent_stage_latency_seconds summary",
+        ]
+        counters = {
+            "agent_prompt_tokens_total": "prompt_tokens",
+            "agent_completion_tokens_total": "completion_tokens",
+            "agent_retries_total": "retries",
+            "agent_samples_total": "samples",
+            "agent_errors_total": "errors",
+            "agent_estimated_cost_usd_total": "estimated_cost_usd",
+        }
+        snapshot = self.snapshot()
+
+        for stage, providers in snapshot.items():
+            for provider, stats in providers.items():
+                labels = f'stage="{stage}",provider="{provider}"'
+                for q in PERCENTILES:
+                    lines.append(
+                        f'agent_stage_latency_seconds{{{labels},quantile="{q}"}} {stats[f"p{int(q * 100)}"]}'
+                    )
+                lines.append(f"agent_stage_latency_seconds_sum{{{labels}}} {stats['total_seconds']}")
+                lines.append(f"agent_stage_latency_seconds_count{{{labels}}} {stats['count']}")
+
+        for metric, field in counters.items():
+            lines.append(f"# TYPE {metric} counter")
+            for stage, providers in snapshot.items():
+                for provider, stats in providers.items():
+                    lines.append(f'{metric}{{stage="{stage}",provider="{provider}"}} {stats[field]}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write metrics to `path` (Prometheus format for .prom/.txt, JSON otherwise)."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+# -----------------------------
+# Shared instance
+# -----------------------------
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    """Return the process-wide Instrumentation registry."""
+    return _instrumentation
+
+
+# -----------------------------
+# Opt-in profiling of a single request
+# -----------------------------
+@contextlib.contextmanager
+def profile_request(mode: str = "cprofile", output: str = None, limit: int = 20):
+    """
+    Profile one request with cProfile ("cprofile") or tracemalloc ("tracemalloc").
+
+    Prints the top `limit` entries; with `output`, cProfile stats are also saved
+    to that file (open with `python -m pstats` or snakeviz).
+    """
+    if mode == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"🧮 tracemalloc: current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB")
+            for stat in snapshot.statistics("lineno")[:limit]:
+                print(f"   {stat}")
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if output:
+            profiler.dump_stats(output)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        print(stream.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent instrumentation tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    profile_parser = subparsers.add_parser("profile", help="Profile planning + evaluation of one task")
+    profile_parser.add_argument("task")
+    profile_parser.add_argument("--mode", choices=["cprofile", "tracemalloc"], default="cprofile")
+    profile_parser.add_argument("--output", help="Save cProfile stats to this file")
+    args = parser.parse_args()
+
+    from agent.planner import TaskPlanner
+    from agent.evaluators import PlanEvaluator
+
+    planner = TaskPlanner(use_cache=False)
+    evaluator = PlanEvaluator()
+
+    with profile_request(args.mode, args.output):
+        todos = planner.generate_todo(args.task)
+        evaluator.evaluate(args.task, todos)
+
+    print(get_instrumentation().to_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+# agent/loadtest.py
+
+"""
+Load-testing harness with a local mock provider server.
+
+Starts an in-process HTTP server that speaks the OpenAI/Groq chat completions
+API and Ollama's /api/chat, with configurable latency distribution, error rate
+and 429 rate (injected on the OpenAI/Groq routes; on /api/chat only with
+--ollama-faults, since Ollama is a local server that never rate-limits). The real planner, evaluator and ReAct code paths (SDK clients,
+connection pools, scheduler and retries included) are pointed at it through
+<PROVIDER>_BASE_URL and driven with synthetic tasks at sweeping concurrency
+levels. Reports throughput, p50/p99 latency and error breakdowns per level.
+
+Usage:
+    python -m agent.loadtest --output loadtest.json
+    python -m agent.loadtest --scenarios planner,evaluator --concurrency 1,8,32,64 \\
+        --latency lognormal:0.3:0.5 --rate-limit-rate 0.05 --error-rate 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent.instrumentation import nearest_rank
+
+SCENARIOS = ("planner", "evaluator", "react")
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+
+
+# -----------------------------
+# Latency distributions
+# -----------------------------
+class LatencyModel:
+    """
+    Simulated provider latency, parsed from a spec string:
+
+        fixed:0.2               always 0.2 s
+        uniform:0.1:0.5         uniform between 0.1 and 0.5 s
+        lognormal:0.3:0.5       median 0.3 s, sigma 0.5 (long right tail)
+    """
+
+    def __init__(self, spec: str = "fixed:0.1", seed: int = None):
+        kind, *params = spec.split(":")
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._random.uniform(self.params[0], self.params[1])
+            median, sigma = self.params
+            return self._random.lognormvariate(math.log(median), sigma)
+
+
+# -----------------------------
+# Mock provider server
+# -----------------------------
+class MockProviderServer:
+    """
+    OpenAI/Groq-compatible (/v1/chat/completions, /openai/v1/chat/completions)
+    and Ollama-compatible (/api/chat) server. Response text comes from the
+    offline StubChatModel, so the agent's parsers see realistic content.
+    Errors and 429s are only injected on /api/chat when `ollama_faults` is set.
+    """
+
+    def __init__(self, latency: LatencyModel, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after_ms: int = 100, seed: int = None, ollama_faults: bool = False):
+        from agent.stub_llm import StubChatModel
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self.ollama_faults = ollama_faults
+        self.stub = StubChatModel()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 512
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-provider", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def _outcome(self, faults: bool = True) -> str:
+        with self._lock:
+            roll = self._random.random()
+            if not faults:
+                outcome = "ok"
+            elif roll < self.rate_limit_rate:
+                outcome = "rate_limited"
+            elif roll < self.rate_limit_rate + self.error_rate:
+                outcome = "error"
+            else:
+                outcome = "ok"
+            self.counts[outcome] += 1
+            return outcome
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                ollama = self.path.endswith("/api/chat")
+                if not ollama and not self.path.endswith("/chat/completions"):
+                    self._send(404, b'{"error": "not found"}')
+                    return
+
+                time.sleep(mock.latency.sample())
+                outcome = mock._outcome(faults=mock.ollama_faults or not ollama)
+                if outcome == "rate_limited":
+                    body = {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}}
+                    self._send(429, json.dumps(body).encode(), headers={
+                        "retry-after-ms": str(mock.retry_after_ms),
+                        "retry-after": str(max(1, mock.retry_after_ms // 1000)),
+                    })
+                    return
+                if outcome == "error":
+                    self._send(500, b'{"error": {"message": "Internal error (mock)", "type": "server_error"}}')
+                    return
+
+                messages = request.get("messages") or [{}]
+                prompt = messages[-1].get("content") or ""
+                text = mock.stub._respond(prompt)
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+                completion_tokens = len(text.split())
+                model = request.get("model", "mock")
+
+                if ollama:
+                    self._ollama(request, model, text, prompt_tokens, completion_tokens)
+                else:
+                    self._openai(request, model, text, prompt_tokens, completion_tokens)
+
+            def _openai(self, request, model, text, prompt_tokens, completion_tokens):
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+                base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": model}
+                if not request.get("stream"):
+                    body = dict(base, object="chat.completion", usage=usage, choices=[{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }])
+                    self._send(200, json.dumps(body).encode())
+                    return
+
+                # Server-sent events, one event per word, sent as a single body
+                events = []
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    delta = {"content": word if i == len(words) - 1 else word + " "}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    events.append(dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": delta, "finish_reason": None},
+                    ]))
+                events.append(dict(base, object="chat.completion.chunk", usage=usage, choices=[
+                    {"index": 0, "delta": {}, "finish_reason": "stop"},
+                ]))
+                body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                self._send(200, body.encode(), content_type="text/event-stream")
+
+            def _ollama(self, request, model, text, prompt_tokens, completion_tokens):
+                created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+                final = {
+                    "model": model,
+                    "created_at": created,
+                    "message": {"role": "assistant", "content": "" if request.get("stream", True) else text},
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": 1_000_000,
+                    "eval_count": completion_tokens,
+                }
+                if not request.get("stream", True):
+                    self._send(200, json.dumps(final).encode())
+                    return
+
+                # Newline-delimited JSON chunks, as Ollama streams by default
+                lines = [
+                    json.dumps({"model": model, "created_at": created,
+                                "message": {"role": "assistant", "content": text}, "done": False}),
+                    json.dumps(final),
+                ]
+                self._send(200, ("\n".join(lines) + "\n").encode(), content_type="application/x-ndjson")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# -----------------------------
+# Synthetic workload
+# -----------------------------
+TASK_VERBS = ["Build", "Plan", "Write", "Organize", "Launch", "Migrate", "Design", "Learn"]
+TASK_OBJECTS = [
+    "a personal website", "a team offsite", "a blog post about caching", "a mobile app",
+    "a data pipeline", "a product launch", "a home garden", "a conference talk",
+]
+TASK_CONTEXTS = [
+    "on a tight budget", "in two weeks", "for a small team", "with no prior experience",
+    "for 500 users", "using open-source tools", "", "before the end of the quarter",
+]
+
+
+def synthetic_tasks(seed: int = 0):
+    """Endless stream of distinct task descriptions (distinct so no cache can hide latency)."""
+    rng = random.Random(seed)
+    for n in itertools.count():
+        context = rng.choice(TASK_CONTEXTS)
+        task = f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_OBJECTS)}"
+        yield f"{task} {context} (#{n})" if context else f"{task} (#{n})"
+
+
+def synthetic_plan(task: str, steps: int = 5) -> list:
+    return [f"{verb} the work for {task.lower()}" for verb in TASK_VERBS[:steps]]
+
+
+def build_scenario(name: str):
+    """Return a callable that runs one request of the given scenario for a task."""
+    if name == "planner":
+        from agent.planner import TaskPlanner
+        planner = TaskPlanner(use_cache=False)
+        return planner.generate_todo
+    if name == "evaluator":
+        from agent.evaluators import PlanEvaluator
+        evaluator = PlanEvaluator()
+
+        def evaluate(task):
+            result = evaluator.evaluate(task, synthetic_plan(task))
+            if result is None:
+                raise RuntimeError("evaluation failed")
+            return result
+        return evaluate
+    if name == "react":
+        from agent.react_loop import react_loop
+        return lambda task: react_loop(task, synthetic_plan(task, steps=3))
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def run_level(fn, tasks, concurrency: int, requests: int, mock: MockProviderServer) -> dict:
+    """Run `requests` calls of `fn` with `concurrency` workers; return throughput, latency and errors."""
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+    task_lock = threading.Lock()
+    before = mock.snapshot()
+
+    def one(_):
+        with task_lock:
+            task = next(tasks)
+        start = time.perf_counter()
+        try:
+            fn(task)
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            if error:
+                errors[error] += 1
+            else:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    after = mock.snapshot()
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": len(latencies),
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50": nearest_rank(latencies, 0.5),
+        "p99": nearest_rank(latencies, 0.99),
+        "errors": dict(errors),
+        "provider_responses": {key: after.get(key, 0) - before.get(key, 0) for key in after},
+    }
+
+
+def configure_environment(provider: str, mock_url: str, keep_rate_limits: bool = False):
+    """
+    Point the agent at the mock server. Must run before any agent setting is read.
+    """
+    os.environ["PRIMARY_LLM_PROVIDER"] = provider
+    os.environ["REACT_LLM_PROVIDER"] = "ollama"
+    os.environ[f"{provider.upper()}_BASE_URL"] = mock_url + ("/openai/v1" if provider == "groq" else "/v1")
+    os.environ["OLLAMA_BASE_URL"] = mock_url
+    os.environ.setdefault(f"{provider.upper()}_API_KEY", "mock-key")
+    # Measure the live code path: no caches, tracing or cassettes
+    os.environ["PLAN_CACHE_PATH"] = ""
+    os.environ["SIMILARITY_INDEX_PATH"] = ""
+    os.environ["LLM_CASSETTE_MODE"] = ""
+    os.environ["LANGSMITH_TRACING_V2"] = "false"
+    if not keep_rate_limits:
+        # The mock has no quota; 429s come only from --rate-limit-rate
+        os.environ[f"{provider.upper()}_RPM"] = "0"
+        os.environ[f"{provider.upper()}_TPM"] = "0"
+
+
+def run_loadtest(
+    scenarios=("planner", "evaluator"),
+    concurrency_levels=None,
+    requests_per_level: int = 64,
+    provider: str = "groq",
+    latency: str = "lognormal:0.2:0.5",
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    keep_rate_limits: bool = False,
+    seed: int = 0,
+    ollama_faults: bool = False,
+):
+    """
+    Start the mock server, sweep concurrency levels for each scenario and
+    return a JSON-serializable report.
+    """
+    concurrency_levels = concurrency_levels or CONCURRENCY_LEVELS
+    mock = MockProviderServer(
+        LatencyModel(latency, seed=seed), error_rate, rate_limit_rate, seed=seed, ollama_faults=ollama_faults
+    ).start()
+    configure_environment(provider, mock.url, keep_rate_limits)
+
+    results = []
+    tasks = synthetic_tasks(seed)
+    try:
+        for scenario in scenarios:
+            fn = build_scenario(scenario)
+            for level in concurrency_levels:
+                print(f"⏱️  {scenario} at concurrency {level}...")
+                row = run_level(fn, tasks, level, max(requests_per_level, level), mock)
+                row["scenario"] = scenario
+                results.append(row)
+    finally:
+        mock.stop()
+
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "provider": provider,
+            "latency": latency,
+            "error_rate": error_rate,
+            "rate_limit_rate": rate_limit_rate,
+            "ollama_faults": ollama_faults,
+            "requests_per_level": requests_per_level,
+            "created_at": time.time(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the agent against a local mock provider.")
+    parser.add_argument("--output", default="loadtest.json", help="Where to write the JSON report")
+    parser.add_argument("--scenarios", default="planner,evaluator", help=f"Comma-separated: {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default=",".join(map(str, CONCURRENCY_LEVELS)), help="Comma-separated levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--provider", choices=["groq", "openai"], default="groq",
+                        help="API flavour to mock (openai needs langchain-openai installed)")
+    parser.add_argument("--latency", default="lognormal:0.2:0.5", help="fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--ollama-faults", action="store_true",
+                        help="Also inject errors and 429s on the Ollama route (react scenario)")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Keep the scheduler's configured RPM/TPM limits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = run_loadtest(
+        scenarios=[s.strip() for s in args.scenarios.split(",") if s.strip()],
+        concurrency_levels=[int(c) for c in args.concurrency.split(",")],
+        requests_per_level=args.requests,
+        provider=args.provider,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        keep_rate_limits=args.keep_rate_limits,
+        seed=args.seed,
+        ollama_faults=args.ollama_faults,
+    )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'scenario':10s} {'conc':>5s} {'rps':>9s} {'p50 ms':>9s} {'p99 ms':>9s}  errors")
+    for row in report["results"]:
+        print(
+            f"{row['scenario']:10s} {row['concurrency']:5d} {row['throughput_rps']:9.2f} "
+            f"{row['p50'] * 1000:9.1f} {row['p99'] * 1000:9.1f}  {row['errors'] or '-'}"
+        )
+    print(f"\n📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# agent/local_runner.py
+
+"""
+Offline local experiment runner.
+
+Reads examples from a JSONL file, runs `agent_runner` + `task_plan_evaluator`
+across a process pool and appends each result to a checkpoint file.
+Re-running with the same checkpoint skips examples that already succeeded.
+
+Example (no network, deterministic stub model):
+    python -m agent.local_runner examples.jsonl --checkpoint results.jsonl --provider stub --workers 4
+
+Add `--store .cache/experiments.sqlite` to reuse planner/judge results from
+earlier runs whose fingerprints are unchanged (see agent.incremental).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+# -----------------------------
+# Examples and checkpoints
+# -----------------------------
+def load_examples(path: str):
+    """
+    Load examples from a JSONL file.
+
+    Each line is either {"id": ..., "inputs": {...}} or a bare inputs dict
+    (e.g. {"task": "..."}). Examples without an id get a stable content hash.
+    """
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            inputs = record.get("inputs", record) if isinstance(record, dict) else record
+            example_id = record.get("id") if isinstance(record, dict) else None
+            if not example_id:
+                payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+                example_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+            examples.append({"id": str(example_id), "inputs": inputs})
+    return examples
+
+
+def load_checkpoint(path: str):
+    """
+    Return {example_id: record} for every example in the checkpoint file.
+    Later lines win, so a successful retry replaces an earlier failure.
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line
+                continue
+            records[record["id"]] = record
+    return records
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+def run_example(example: dict):
+    """
+    Run the agent and the evaluator on one example (executed in a worker process).
+    """
+    from agent.run_experiment import agent_runner, task_plan_evaluator
+    from agent.instrumentation import get_instrumentation
+
+    started = time.time()
+    tokens_before = get_instrumentation().token_totals()
+    record = {"id": example["id"], "inputs": example["inputs"]}
+
+    try:
+        outputs = agent_runner(example["inputs"])
+        feedback = task_plan_evaluator(SimpleNamespace(outputs=outputs), example["inputs"])
+
+        record["outputs"] = outputs
+        record["feedback"] = feedback.get("results") or [{"key": "score", "score": feedback.get("score", 0.0)}]
+        record["comment"] = feedback.get("comment", "")
+        record["scores"] = feedback.get("scores")
+        record["error"] = None
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["started_at"] = started
+    record["duration"] = time.time() - started
+
+    # Workers run one example at a time, so the token delta belongs to this example
+    prompt_tokens, completion_tokens = get_instrumentation().token_totals()
+    record["prompt_tokens"] = prompt_tokens - tokens_before[0]
+    record["completion_tokens"] = completion_tokens - tokens_before[1]
+    return record
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def run_local(examples_path: str, checkpoint_path: str, workers: int = 4):
+    """
+    Run every example not yet completed in `checkpoint_path`.
+
+    Returns:
+        list: All successful records (previous runs included)
+    """
+    examples = load_examples(examples_path)
+    done = {eid for eid, rec in load_checkpoint(checkpoint_path).items() if not rec.get("error")}
+    pending = [ex for ex in examples if ex["id"] not in done]
+
+    print(f"📦 {len(examples)} examples, {len(done)} already done, {len(pending)} to run")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool, open(checkpoint_path, "a", encoding="utf-8") as out:
+            futures = [pool.submit(run_example, ex) for ex in pending]
+            for i, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+
+                # Append-only: one flushed line per finished example
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+
+                status = "❌ " + record["error"] if record["error"] else "✅"
+                print(f"[{i}/{len(pending)}] {record['id']} {status}")
+
+    records = load_checkpoint(checkpoint_path)
+    return [rec for rec in records.values() if not rec.get("error")]
+
+
+def upload_results(records: list, experiment_prefix: str):
+    """
+    Upload finished results to LangSmith as runs with score feedback.
+    """
+    from langsmith import Client
+
+    client = Client()
+    project_name = f"{experiment_prefix}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+
+    for record in records:
+        run_id = uuid.uuid4()
+        start_time = datetime.fromtimestamp(record["started_at"], tz=timezone.utc)
+        end_time = datetime.fromtimestamp(record["started_at"] + record["duration"], tz=timezone.utc)
+
+        client.create_run(
+            name="agent_runner",
+            inputs=record["inputs"],
+            run_type="chain",
+            project_name=project_name,
+            id=run_id,
+            outputs=record["outputs"],
+            start_time=start_time,
+            end_time=end_time,
+            extra={"metadata": {"example_id": record["id"]}},
+        )
+        for item in record["feedback"]:
+            client.create_feedback(run_id, item["key"], score=item["score"], comment=record.get("comment"))
+
+    print(f"☁️ Uploaded {len(records)} results to LangSmith project '{project_name}'")
+
+
+def summarize(records: list):
+    """Print the mean score of the completed run."""
+    scores = [
+        item["score"]
+        for rec in records
+        for item in rec["feedback"]
+        if item["key"] == "score"
+    ]
+    if scores:
+        print(f"📊 Mean score over {len(scores)} examples: {sum(scores) / len(scores):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run experiments locally from a JSONL file.")
+    parser.add_argument("examples", help="JSONL file with one example per line")
+    parser.add_argument("--checkpoint", default="results.jsonl", help="Append-only results file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--provider", help="Override PRIMARY_LLM_PROVIDER (use 'stub' for offline runs)")
+    parser.add_argument("--upload", action="store_true", help="Upload finished results to LangSmith")
+    parser.add_argument("--experiment-prefix", default="local-run")
+    parser.add_argument("--store", help="Incremental store path: reuse unchanged planner/judge results")
+    parser.add_argument("--scores-dir", help="Also write per-example scores to this columnar score store")
+    args = parser.parse_args()
+
+    # Must be set before any agent module is imported (workers inherit the environment)
+    if args.provider:
+        os.environ["PRIMARY_LLM_PROVIDER"] = args.provider
+    if not args.upload:
+        os.environ["LANGSMITH_TRACING_V2"] = "false"
+    if args.store:
+        os.environ["INCREMENTAL_STORE_PATH"] = args.store
+        os.environ["EXPERIMENT_RUN_ID"] = uuid.uuid4().hex
+
+    # Normalize the dataset once (cached per file version); workers open the same index
+    from agent.task_index import load_or_build_jsonl
+    os.environ["TASK_INDEX_PATH"] = load_or_build_jsonl(args.examples).path
+
+    records = run_local(args.examples, args.checkpoint, workers=args.workers)
+    summarize(records)
+
+    if args.scores_dir:
+        from agent.score_store import ScoreStore, rows_from_records
+        ScoreStore(args.scores_dir).write(args.experiment_prefix, rows_from_records(records))
+        print(f"📈 Scores written to {os.path.join(args.scores_dir, args.experiment_prefix)}")
+
+    if args.store:
+        from agent.incremental import IncrementalStore, print_report
+        print_report(IncrementalStore(args.store, run_id=os.environ["EXPERIMENT_RUN_ID"]).report())
+
+    if args.upload:
+        upload_results(records, args.experiment_prefix)
+
+
+if __name__ == "__main__":
+    main()
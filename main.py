@@ -1,10 +1,11 @@
 import os
-from dotenv import load_dotenv
+from agent import config
 from agent.planner import TaskPlanner
 from agent.evaluators import PlanEvaluator
+from agent.scheduler import interactive
 
 # Load environment variables
-load_dotenv()
+config.load_env()
 os.environ["LANGSMITH_PROJECT"] = "agentic-ai-infosys"
 
 def main():
@@ -22,12 +23,12 @@ def main():
 
         print("\n🧠 Thinking... Breaking task into steps on Groq...")
         
-        # Generate the plan
-        todo_list = planner.generate_todo(user_task)
-
+        # Stream the plan: each step is printed as soon as it is generated
+        # Interactive lane: admitted ahead of any bulk experiment traffic
         print("\n📝 GENERATED TODOs:")
-        for i, step in enumerate(todo_list, 1):
-            print(f"{i}. {step}")
+        with interactive():
+            for i, step in enumerate(planner.stream_todo(user_task), 1):
+                print(f"{i}. {step}")
 
         
 
@@ -0,0 +1,183 @@
+# agent/plan_cache.py
+
+"""
+Persistent, content-addressed cache for generated TODO plans.
+
+Plans are keyed on everything that determines the LLM output:
+the rendered planner prompt, the provider, the model name and the temperature.
+Entries live in a small SQLite file so several processes (experiment workers,
+the playground, LangGraph runs) can share one cache safely.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agent import config
+
+
+class PlanCache:
+    """
+    On-disk plan cache with size and age limits and LRU eviction.
+
+    Hit, miss and eviction counters are kept per process and exposed via `stats()`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY,
+                steps TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access)"
+        )
+
+    def _connect(self):
+        """Return a per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; WAL lets readers and a writer from other processes coexist
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    @staticmethod
+    def make_key(prompt: str, provider: str, model: str, temperature) -> str:
+        """Build the content address for a rendered prompt and model settings."""
+        payload = json.dumps([prompt, provider, model, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Return the cached list of steps for `key`, or None on a miss.
+        Expired entries are removed when they are found.
+        """
+        conn = self._connect()
+        now = time.time()
+
+        row = conn.execute(
+            "SELECT steps, created_at FROM plans WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        steps, created_at = row
+        if self.max_age and now - created_at > self.max_age:
+            deleted = conn.execute("DELETE FROM plans WHERE key = ?", (key,)).rowcount
+            self._count("evictions", deleted)
+            self._count("misses")
+            return None
+
+        conn.execute("UPDATE plans SET last_access = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return json.loads(steps)
+
+    def put(self, key: str, steps: list):
+        """Store a plan and enforce the size and age limits."""
+        conn = self._connect()
+        now = time.time()
+
+        conn.execute(
+            "INSERT OR REPLACE INTO plans (key, steps, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(steps, ensure_ascii=False), now, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        """Drop expired entries, then the least recently used ones above `max_entries`."""
+        deleted = 0
+
+        # IMMEDIATE takes the write lock up front so concurrent evictors don't interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.max_age:
+                deleted += conn.execute(
+                    "DELETE FROM plans WHERE created_at < ?", (now - self.max_age,)
+                ).rowcount
+
+            (count,) = conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+            overflow = count - self.max_entries
+            if self.max_entries and overflow > 0:
+                deleted += conn.execute(
+                    "DELETE FROM plans WHERE key IN "
+                    "(SELECT key FROM plans ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if deleted:
+            self._count("evictions", deleted)
+
+    def clear(self):
+        """Remove every cached plan."""
+        self._connect().execute("DELETE FROM plans")
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current number of entries."""
+        (entries,) = self._connect().execute("SELECT COUNT(*) FROM plans").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
+
+
+# -----------------------------
+# Shared cache instance
+# -----------------------------
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_plan_cache():
+    """
+    Return the process-wide PlanCache, or None when PLAN_CACHE_PATH is not set.
+    """
+    global _shared_cache
+    if not config.PLAN_CACHE_PATH:
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = PlanCache(
+                config.PLAN_CACHE_PATH,
+                max_entries=config.PLAN_CACHE_MAX_ENTRIES,
+                max_age=config.PLAN_CACHE_MAX_AGE,
+            )
+        return _shared_cache
@@ -0,0 +1,277 @@
+# agent/plan_tree.py
+
+"""
+Hierarchical planning with parallel sub-plan expansion.
+
+The task is planned into top-level steps first (through TaskPlanner's normal
+cache/similarity path); then every step of a level is expanded into sub-steps
+concurrently, each with its own small prompt that only carries the overall
+goal and the step's ancestors. Expansion stops at the depth limit, keeps at
+most `max_width` children per step, and is skipped for steps that would push
+the tree past its total token budget (they stay leaves).
+
+Each expansion is cached under its own prompt in the plan cache, so
+re-expanding one branch (`HierarchicalPlanner.expand`) regenerates only that
+branch, and unchanged branches of a re-planned tree come back from the cache.
+
+Usage:
+    python -m agent.plan_tree "Launch a SaaS product" --depth 2 --width 5
+"""
+
+import argparse
+import json
+
+from agent import config
+from agent.plan_cache import PlanCache
+from agent.planner import _to_messages
+from agent.prompts import get_subplan_prompt
+from agent.instrumentation import get_instrumentation, usage_from
+
+# Completion tokens assumed per sub-step until real usage has been seen
+EST_TOKENS_PER_STEP = 24
+
+
+class PlanNode:
+    """
+    One step of a hierarchical plan. The root's `step` is the task itself.
+    """
+
+    def __init__(self, step: str, children: list = None):
+        self.step = step
+        self.children = children or []
+
+    def child(self, path) -> "PlanNode":
+        """Return the node at `path`, a sequence of 0-based child indices."""
+        node = self
+        for index in path:
+            node = node.children[index]
+        return node
+
+    def walk(self, path=()):
+        """Yield (path, node) for every descendant, depth-first in plan order."""
+        for i, child in enumerate(self.children):
+            yield path + (i,), child
+            yield from child.walk(path + (i,))
+
+    def flatten(self, numbered: bool = False) -> list:
+        """
+        Flatten the tree into today's list-of-steps format.
+
+        By default returns the leaf steps in order, i.e. the executable TODOs.
+        With `numbered=True`, returns every step prefixed with its outline
+        number ("2.", "2.1.", ...) for display.
+        """
+        if numbered:
+            return [f"{'.'.join(str(i + 1) for i in path)}. {node.step}" for path, node in self.walk()]
+        return [node.step for _, node in self.walk() if not node.children]
+
+    def depth(self) -> int:
+        """Number of step levels below this node."""
+        return 1 + max(child.depth() for child in self.children) if self.children else 0
+
+    def to_dict(self) -> dict:
+        return {"step": self.step, "children": [child.to_dict() for child in self.children]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlanNode":
+        return cls(data["step"], [cls.from_dict(child) for child in data.get("children", [])])
+
+    def __repr__(self):
+        return f"PlanNode({self.step!r}, children={len(self.children)})"
+
+
+class HierarchicalPlanner:
+    """
+    Builds PlanNode trees with a TaskPlanner's model and plan cache.
+
+    After each `generate` / `expand`, `last_stats` holds the tokens spent,
+    LLM calls, cache hits, failed expansions and expansions skipped for budget.
+    """
+
+    def __init__(
+        self,
+        planner=None,
+        max_depth: int = None,
+        max_width: int = None,
+        token_budget: int = None,
+        max_concurrency: int = None,
+    ):
+        if planner is None:
+            from agent.planner import TaskPlanner
+            planner = TaskPlanner()
+        self.planner = planner
+        self.max_depth = max_depth or config.PLAN_MAX_DEPTH
+        self.max_width = max_width or config.PLAN_MAX_WIDTH
+        self.token_budget = token_budget or config.PLAN_TOKEN_BUDGET
+        self.max_concurrency = max_concurrency or config.PLANNER_MAX_CONCURRENCY
+        self.last_stats = None
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def generate(self, task: str) -> PlanNode:
+        """Plan `task` as a tree of at most `max_depth` levels of steps."""
+        self._reset_stats()
+        root = PlanNode(task)
+        with get_instrumentation().stage("planner.generate_tree", config.PRIMARY_PROVIDER):
+            root.children = [PlanNode(step) for step in self._top_level(task)[:self.max_width]]
+            self._expand_levels(root, [((i,), child) for i, child in enumerate(root.children)])
+        return root
+
+    def expand(self, root: PlanNode, path, refresh: bool = True) -> PlanNode:
+        """
+        Re-expand the branch at `path` (child indices from the root) in place.
+
+        With `refresh`, the branch's own expansion bypasses the cache and the new
+        result replaces the cached one; deeper levels and the rest of the tree
+        are left to the cache.
+        """
+        self._reset_stats()
+        path = tuple(path)
+        if not path or len(path) >= self.max_depth:
+            raise ValueError(f"Cannot expand path {path}: branches go 1 to {self.max_depth - 1} levels deep")
+        node = root.child(path)
+        with get_instrumentation().stage("planner.expand_branch", config.PRIMARY_PROVIDER):
+            self._expand_level(root, [(path, node)], refresh=refresh)
+            self._expand_levels(root, [(path + (i,), child) for i, child in enumerate(node.children)])
+        return root
+
+    # -----------------------------
+    # Expansion
+    # -----------------------------
+    def _reset_stats(self):
+        self.last_stats = {"tokens": 0, "llm_calls": 0, "cache_hits": 0, "failed": 0, "skipped_for_budget": 0}
+        self._completion_tokens_seen = []
+
+    def _top_level(self, task: str) -> list:
+        """Top-level steps through the planner's own cache/similarity lookup."""
+        planner = self.planner
+        prompt, cache_key, cached = planner._lookup(task)
+        if cached is not None:
+            self.last_stats["cache_hits"] += 1
+            return cached
+
+        with get_instrumentation().stage("planner.llm", config.PRIMARY_PROVIDER) as span:
+            response = planner.llm.invoke(_to_messages(prompt))
+            span["usage"] = response
+        self._spend(response)
+        return planner._store(task, cache_key, planner._parse_steps(response.content))
+
+    def _expand_levels(self, root: PlanNode, frontier: list):
+        """Expand `frontier` and the levels below it, breadth-first, down to max_depth."""
+        while frontier and len(frontier[0][0]) < self.max_depth:
+            self._expand_level(root, frontier)
+            frontier = [
+                (path + (i,), child)
+                for path, node in frontier
+                for i, child in enumerate(node.children)
+            ]
+
+    def _expand_level(self, root: PlanNode, targets: list, refresh: bool = False):
+        """Expand every (path, node) in `targets` concurrently; cached expansions are free."""
+        planner = self.planner
+        pending = []
+
+        for path, node in targets:
+            prompt = get_subplan_prompt(root.step, self._outline(root, path), node.step, self.max_width)
+            cache_key = None
+            if planner.cache is not None:
+                cache_key = PlanCache.make_key(prompt, config.PRIMARY_PROVIDER, planner.model_name, planner.temperature)
+                cached = None if refresh else planner.cache.get(cache_key)
+                if cached is not None:
+                    self.last_stats["cache_hits"] += 1
+                    node.children = [PlanNode(step) for step in cached[:self.max_width]]
+                    continue
+            pending.append((node, prompt, cache_key))
+
+        pending = self._within_budget(pending)
+        if not pending:
+            return
+
+        with get_instrumentation().stage("planner.expand_level", config.PRIMARY_PROVIDER) as span:
+            responses = planner.llm.batch(
+                [_to_messages(prompt) for _, prompt, _ in pending],
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True,
+            )
+            for (node, _, cache_key), response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    self.last_stats["failed"] += 1
+                    continue
+                prompt_tokens, completion_tokens = usage_from(response)
+                span["prompt_tokens"] += prompt_tokens
+                span["completion_tokens"] += completion_tokens
+                self._spend(response)
+
+                steps = planner._parse_steps(response.content)
+                if not steps:
+                    self.last_stats["failed"] += 1
+                    continue
+                if cache_key is not None:
+                    planner.cache.put(cache_key, steps)
+                node.children = [PlanNode(step) for step in steps[:self.max_width]]
+
+    def _within_budget(self, pending: list) -> list:
+        """Keep the expansions whose estimated cost still fits the token budget."""
+        if self._completion_tokens_seen:
+            completion = sum(self._completion_tokens_seen) / len(self._completion_tokens_seen)
+        else:
+            completion = EST_TOKENS_PER_STEP * self.max_width
+
+        admitted = []
+        committed = self.last_stats["tokens"]
+        for item in pending:
+            # ~4 characters per token for the prompt
+            estimate = len(item[1]) / 4 + completion
+            if committed + estimate > self.token_budget:
+                self.last_stats["skipped_for_budget"] += 1
+                continue
+            committed += estimate
+            admitted.append(item)
+        return admitted
+
+    def _spend(self, response):
+        prompt_tokens, completion_tokens = usage_from(response)
+        if not prompt_tokens and not completion_tokens:
+            # Providers that report no usage: estimate from the text
+            completion_tokens = len(response.content) // 4
+        self.last_stats["tokens"] += prompt_tokens + completion_tokens
+        self.last_stats["llm_calls"] += 1
+        self._completion_tokens_seen.append(completion_tokens)
+
+    @staticmethod
+    def _outline(root: PlanNode, path) -> str:
+        """Numbered chain of ancestor steps down to the node at `path`."""
+        lines = []
+        node = root
+        for depth, index in enumerate(path):
+            node = node.children[index]
+            number = ".".join(str(i + 1) for i in path[:depth + 1])
+            lines.append(f"{'  ' * depth}{number}. {node.step}")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a hierarchical plan.")
+    parser.add_argument("task")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Print the tree as JSON")
+    args = parser.parse_args()
+
+    config.load_env()
+    planner = HierarchicalPlanner(max_depth=args.depth, max_width=args.width, token_budget=args.token_budget)
+    tree = planner.generate(args.task)
+
+    if args.json:
+        print(json.dumps(tree.to_dict(), indent=2))
+    else:
+        for line in tree.flatten(numbered=True):
+            number = line.split(" ", 1)[0]
+            print("   " * (number.count(".") - 1) + line)
+    print(f"\n📊 {planner.last_stats}")
+
+
+if __name__ == "__main__":
+    main()
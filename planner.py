@@ -1,67 +1,303 @@
 # agent/planner.py
 
-from langchain_core.messages import HumanMessage
-from langchain_groq import ChatGroq
-import os
-from langchain_core.tools import tool
+# Importing this module does no I/O: settings, provider SDKs and LangChain
+# message classes are loaded on first use.
+import time
 
-from dotenv import load_dotenv
+from agent import config
+from agent.prompts import TASK_PLANNER_PROMPT, SIMILAR_PLAN_HINT
+from agent.config import get_model_name, get_api_key, get_chat_model
+from agent.plan_cache import PlanCache, get_plan_cache
+from agent.similarity import get_similarity_index
+from agent.instrumentation import get_instrumentation, usage_from
 
-load_dotenv()
 
-from agent.prompts import TASK_PLANNER_PROMPT
+def _to_messages(prompt: str):
+    """Wrap a rendered prompt as a single human message."""
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=prompt)]
 
 
-from agent.config import get_model_name, get_api_key
-
-from agent.config import get_model_name, get_api_key, PRIMARY_PROVIDER
-
 class TaskPlanner:
     """
     TaskPlanner uses an LLM (Groq, OpenAI, or Anthropic) to generate 
     step-by-step TODOs for a given task description.
     """
 
-    def __init__(self, model_name: str = None, temperature: float = 0.2):
+    def __init__(
+        self,
+        model_name: str = None,
+        temperature: float = None,
+        use_cache: bool = True,
+        reuse_threshold: float = None,
+        seed_threshold: float = None,
+    ):
         self.model_name = model_name or get_model_name()
+        self.temperature = config.PLANNER_TEMPERATURE if temperature is None else temperature
         self.api_key = get_api_key()
+
+        # Shared on-disk plan cache (None unless PLAN_CACHE_PATH is configured)
+        self.cache = get_plan_cache() if use_cache else None
+
+        # Near-duplicate task index (None unless SIMILARITY_INDEX_PATH is configured)
+        self.similar = get_similarity_index() if use_cache else None
+        self.reuse_threshold = config.PLAN_REUSE_THRESHOLD if reuse_threshold is None else reuse_threshold
+        self.seed_threshold = config.PLAN_SEED_THRESHOLD if seed_threshold is None else seed_threshold
+
+        # Similar task used by the most recent lookup: {"task", "score", "mode"} or None
+        self.last_match = None
         
-        # Dynamically select the LLM class based on the provider
-        if PRIMARY_PROVIDER == "groq":
-            from langchain_groq import ChatGroq
-            self.llm = ChatGroq(model=self.model_name, temperature=temperature, api_key=self.api_key)
-        elif PRIMARY_PROVIDER == "openai":
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(model=self.model_name, temperature=temperature, api_key=self.api_key)
-        elif PRIMARY_PROVIDER == "anthropic":
-            from langchain_anthropic import ChatAnthropic
-            self.llm = ChatAnthropic(model=self.model_name, temperature=temperature, api_key=self.api_key)
-        else:
-            from langchain_groq import ChatGroq
-            self.llm = ChatGroq(model=self.model_name, temperature=temperature, api_key=self.api_key)
+        # Shared chat model for this provider/model/temperature, or the hedged
+        # provider chain when LLM_PROVIDER_CHAIN is set (see config.get_chat_model)
+        self.llm = get_chat_model(model_name=self.model_name, temperature=self.temperature)
 
     def generate_todo(self, task: str):
         """
         Generate TODO steps for a given task.
         Returns a list of numbered steps without duplicate numbering.
         """
+        metrics = get_instrumentation()
+
+        with metrics.stage("planner.generate_todo", config.PRIMARY_PROVIDER):
+            # Prompt formatting + cache lookup
+            with metrics.stage("planner.format", config.PRIMARY_PROVIDER):
+                prompt, cache_key, cached = self._lookup(task)
+            if cached is not None:
+                return cached
+
+            # Send the prompt to the LLM
+            with metrics.stage("planner.llm", config.PRIMARY_PROVIDER) as span:
+                response = self.llm.invoke(_to_messages(prompt))
+                span["usage"] = response
+
+            with metrics.stage("planner.parse", config.PRIMARY_PROVIDER):
+                return self._store(task, cache_key, self._parse_steps(response.content))
+
+    def stream_todo(self, task: str):
+        """
+        Stream TODO steps for a given task.
+        Yields each step as soon as its numbered line has fully arrived,
+        so callers can start on step 1 while later steps are still being generated.
+        """
+        prompt, cache_key, cached = self._lookup(task)
+        if cached is not None:
+            yield from cached
+            return
+
+        metrics = get_instrumentation()
+        started = time.perf_counter()
+        prompt_tokens = completion_tokens = 0
+
+        steps = []
+        buffer = ""
+
+        for chunk in self.llm.stream(_to_messages(prompt)):
+            buffer += chunk.content
+            chunk_prompt_tokens, chunk_completion_tokens = usage_from(chunk)
+            prompt_tokens += chunk_prompt_tokens
+            completion_tokens += chunk_completion_tokens
+
+            # Every complete line in the buffer can be parsed right away
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                step = self._parse_line(line)
+                if step is not None:
+                    if not steps:
+                        # Time-to-first-step is the latency users notice
+                        metrics.record("planner.first_step", time.perf_counter() - started, config.PRIMARY_PROVIDER)
+                    steps.append(step)
+                    yield step
+
+        # The last line has no trailing newline
+        step = self._parse_line(buffer)
+        if step is not None:
+            steps.append(step)
+            yield step
+
+        metrics.record(
+            "planner.stream_todo",
+            time.perf_counter() - started,
+            config.PRIMARY_PROVIDER,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        self._store(task, cache_key, steps)
+
+    async def agenerate_todo(self, task: str):
+        """
+        Async version of `generate_todo`.
+        """
+        prompt, cache_key, cached = self._lookup(task)
+        if cached is not None:
+            return cached
+
+        with get_instrumentation().stage("planner.llm", config.PRIMARY_PROVIDER) as span:
+            response = await self.llm.ainvoke(_to_messages(prompt))
+            span["usage"] = response
+
+        return self._store(task, cache_key, self._parse_steps(response.content))
+
+    def generate_todo_tree(self, task: str, max_depth: int = None, max_width: int = None, token_budget: int = None):
+        """
+        Hierarchical version of `generate_todo`: top-level steps, each expanded
+        into sub-steps concurrently (see agent.plan_tree).
+        Returns a PlanNode; `.flatten()` gives the list format of `generate_todo`.
+        """
+        from agent.plan_tree import HierarchicalPlanner
+
+        tree_planner = HierarchicalPlanner(self, max_depth=max_depth, max_width=max_width, token_budget=token_budget)
+        return tree_planner.generate(task)
+
+    def generate_todos(self, tasks: list, max_concurrency: int = None):
+        """
+        Generate TODO steps for many tasks with at most `max_concurrency` requests in flight
+        (defaults to config.PLANNER_MAX_CONCURRENCY).
+
+        Returns a list in the same order as `tasks`. Each entry is either the list
+        of steps for that task or the exception raised while planning it, so one
+        failed request does not sink the whole batch.
+        """
+        results, pending = self._split_cached(tasks)
+        if not pending:
+            return results
+        max_concurrency = max_concurrency or config.PLANNER_MAX_CONCURRENCY
+
+        with get_instrumentation().stage("planner.generate_todos", config.PRIMARY_PROVIDER) as span:
+            responses = self.llm.batch(
+                [_to_messages(prompt) for _, _, prompt, _ in pending],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+            self._collect(results, pending, responses, span)
+        return results
+
+    async def agenerate_todos(self, tasks: list, max_concurrency: int = None):
+        """
+        Async version of `generate_todos`.
+        """
+        results, pending = self._split_cached(tasks)
+        if not pending:
+            return results
+        max_concurrency = max_concurrency or config.PLANNER_MAX_CONCURRENCY
+
+        with get_instrumentation().stage("planner.generate_todos", config.PRIMARY_PROVIDER) as span:
+            responses = await self.llm.abatch(
+                [_to_messages(prompt) for _, _, prompt, _ in pending],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+            self._collect(results, pending, responses, span)
+        return results
+
+    # -----------------------------
+    # Cache helpers
+    # -----------------------------
+    def _lookup(self, task: str):
+        """
+        Render the prompt for `task` and check the plan cache, then the similarity index.
+        Returns (prompt, cache_key, cached_steps_or_None).
+        """
         # Fill in the task in the prompt
         prompt = TASK_PLANNER_PROMPT.format(task=task)
+        cache_key = None
+
+        # Reuse a cached plan for the same prompt, provider, model and temperature
+        if self.cache is not None:
+            cache_key = PlanCache.make_key(prompt, config.PRIMARY_PROVIDER, self.model_name, self.temperature)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return prompt, cache_key, cached
+
+        # Reuse, or seed the prompt with, the plan of a near-duplicate task
+        match = self._find_similar(task)
+        if match is not None:
+            if match.score >= self.reuse_threshold:
+                return prompt, cache_key, match.steps
+            similar_plan = "\n".join(f"{i}. {step}" for i, step in enumerate(match.steps, 1))
+            prompt = SIMILAR_PLAN_HINT.format(similar_task=match.task, similar_plan=similar_plan) + prompt
+
+        return prompt, cache_key, None
+
+    def _find_similar(self, task: str):
+        """Return the most similar stored task above the seed threshold, or None."""
+        self.last_match = None
+        if self.similar is None:
+            return None
 
-        # Send the prompt to the LLM
-        response = self.llm.invoke([HumanMessage(content=prompt)])
+        started = time.perf_counter()
+        match = self.similar.query(
+            task, scope=self._scope(), threshold=min(self.seed_threshold, self.reuse_threshold)
+        )
+        get_instrumentation().record("planner.similarity", time.perf_counter() - started, config.PRIMARY_PROVIDER)
 
-        # Extract lines starting with a number and remove duplicate numbering
+        if match is not None:
+            mode = "reused" if match.score >= self.reuse_threshold else "seeded"
+            self.last_match = {"task": match.task, "score": match.score, "mode": mode}
+            print(f"🔁 Similar task ({mode}, score={match.score:.2f}): {match.task}")
+        return match
+
+    def _scope(self) -> str:
+        return f"{config.PRIMARY_PROVIDER}:{self.model_name}:{self.temperature}"
+
+    def _store(self, task: str, cache_key, steps: list):
+        # Only cache usable plans
+        if steps:
+            if cache_key is not None:
+                self.cache.put(cache_key, steps)
+            if self.similar is not None:
+                self.similar.add(task, steps, scope=self._scope())
+        return steps
+
+    def _split_cached(self, tasks: list):
+        """Fill cached results and return the (index, task, prompt, cache_key) entries still to plan."""
+        results = [None] * len(tasks)
+        pending = []
+        for i, task in enumerate(tasks):
+            prompt, cache_key, cached = self._lookup(task)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, task, prompt, cache_key))
+        return results, pending
+
+    def _collect(self, results: list, pending: list, responses: list, span: dict):
+        """Parse batch responses into `results`, keeping per-task exceptions."""
+        for (i, task, _, cache_key), response in zip(pending, responses):
+            if isinstance(response, Exception):
+                results[i] = response
+                continue
+            prompt_tokens, completion_tokens = usage_from(response)
+            span["prompt_tokens"] += prompt_tokens
+            span["completion_tokens"] += completion_tokens
+            try:
+                results[i] = self._store(task, cache_key, self._parse_steps(response.content))
+            except Exception as e:
+                results[i] = e
+
+    @staticmethod
+    def _parse_steps(content: str):
+        """
+        Extract lines starting with a number and remove duplicate numbering.
+        """
         steps = []
-        for line in response.content.split("\n"):
-            line = line.strip()
-            if line and line[0].isdigit():
-                # Remove duplicate numbering (e.g., '1. 1. Research...' -> 'Research...')
-                clean_line = line.split('.', 1)[1].strip()
-                steps.append(clean_line)
+        for line in content.split("\n"):
+            step = TaskPlanner._parse_line(line)
+            if step is not None:
+                steps.append(step)
 
         return steps
 
+    @staticmethod
+    def _parse_line(line: str):
+        """
+        Return the cleaned step for a numbered line, or None for any other line.
+        """
+        line = line.strip()
+        if line and line[0].isdigit():
+            # Remove duplicate numbering (e.g., '1. 1. Research...' -> 'Research...')
+            return line.split('.', 1)[1].strip()
+        return None
+
 
 # -----------------------------
 # Backward-compatible function
@@ -74,20 +310,45 @@ def plan_task(task: str):
     planner = TaskPlanner()
     return planner.generate_todo(task)
 
-# -----------------------------
-# LangChain / LangGraph Tool
-# -----------------------------
-from langchain_core.tools import tool
 
-@tool
-def write_todos(task: str) -> list:
+def plan_tasks(tasks: list, max_concurrency: int = None):
     """
-    LangGraph / LangChain tool to generate a structured TODO list
-    from a high-level task description.
+    Batch version of `plan_task`.
+    Returns one entry per task, in order: a list of steps or the exception raised.
     """
     planner = TaskPlanner()
-    todos = planner.generate_todo(task)
-    return todos
+    return planner.generate_todos(tasks, max_concurrency=max_concurrency)
+
+# -----------------------------
+# LangChain / LangGraph Tool
+# -----------------------------
+def _build_write_todos():
+    from langchain_core.tools import tool
+
+    @tool
+    def write_todos(task: str, hierarchical: bool = None) -> list:
+        """
+        LangGraph / LangChain tool to generate a structured TODO list
+        from a high-level task description. With `hierarchical`, large tasks
+        are planned as a tree and the leaf steps are returned.
+        """
+        planner = TaskPlanner()
+        if hierarchical is None:
+            hierarchical = config.PLAN_HIERARCHICAL
+        if hierarchical:
+            return planner.generate_todo_tree(task).flatten()
+        todos = planner.generate_todo(task)
+        return todos
+
+    return write_todos
+
+
+def __getattr__(name: str):
+    # `write_todos` is built on first access so importing the planner stays cheap
+    if name == "write_todos":
+        globals()["write_todos"] = _build_write_todos()
+        return globals()["write_todos"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -----------------------------
 # Simple example usage
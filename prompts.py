@@ -27,6 +27,45 @@ Provide the numbered plan below:
 # Alias for easier usage
 PLANNER_PROMPT = TASK_PLANNER_PROMPT
 
+# 🔹 Context placed before TASK_PLANNER_PROMPT when a similar task was planned before
+SIMILAR_PLAN_HINT = """
+A similar request was planned before.
+
+Similar request:
+{similar_task}
+
+Its plan:
+{similar_plan}
+
+Use it as a reference: keep the steps that still apply and change or add steps for anything that differs.
+"""
+
+# 🔹 Prompt for expanding one step of a hierarchical plan into sub-steps.
+# Only the overall goal and the step's ancestors are included, so the prompt
+# stays small at any depth and each expansion can be cached on its own.
+SUBPLAN_PROMPT = """
+You are an expert project manager and planning agent.
+
+You are refining one step of a larger plan into smaller sub-steps.
+
+Overall goal:
+{goal}
+
+Position in the plan:
+{outline}
+
+Rules for your sub-steps:
+1. **Stay in Scope**: Cover only the step below, not the rest of the plan.
+2. **Actionability**: Each sub-step must start with an action verb.
+3. **Size**: Return at most {max_steps} sub-steps.
+4. **Format**: Return the sub-steps as a clean, numbered list.
+
+Task:
+{step}
+
+Provide the numbered plan below:
+"""
+
 # 🔹 Prompt for explaining a topic simply (used for demo / testing)
 SIMPLE_EXPLAIN_PROMPT = """
 Explain the following topic in SIMPLE language
@@ -57,6 +96,27 @@ Current TODO:
 Think clearly before acting.
 """
 
+# 🔹 ReAct session prompts (see react_loop.ReactSession)
+# The system message (rules + task) is identical for every step of a task, so the
+# local model server can reuse its cached prefix; only the per-TODO suffix changes.
+REACT_SESSION_SYSTEM_PROMPT = """
+You are a reasoning agent working through a task one TODO item at a time.
+
+For each TODO you are given:
+- Think step by step about the TODO item.
+- Decide what action should be taken next.
+- Build on the observations from earlier TODO items.
+
+Think clearly before acting.
+
+Current task:
+{task}
+"""
+
+REACT_SESSION_STEP_PROMPT = """Current TODO:
+{todo}
+"""
+
 # 🔹 Prompt for executing a TODO item
 EXECUTION_PROMPT = """
 You are executing a task. Think step by step.
@@ -78,6 +138,10 @@ def get_task_plan(task):
     """Return the formatted planning prompt for a task."""
     return PLANNER_PROMPT.format(task=task)
 
+def get_subplan_prompt(goal, outline, step, max_steps):
+    """Return the formatted prompt for expanding one plan step into sub-steps."""
+    return SUBPLAN_PROMPT.format(goal=goal, outline=outline, step=step, max_steps=max_steps)
+
 def get_simple_explanation(topic):
     """Return the formatted simple explanation prompt for a topic."""
     return SIMPLE_EXPLAIN_PROMPT.format(task=topic)
@@ -86,6 +150,10 @@ def get_react_prompt(task, todo):
     """Return the formatted ReAct reasoning prompt."""
     return REACT_REASON_PROMPT.format(task=task, todo=todo)
 
+def get_react_session_prompts(task, todo):
+    """Return the (stable prefix, per-TODO suffix) pair used by ReAct sessions."""
+    return REACT_SESSION_SYSTEM_PROMPT.format(task=task), REACT_SESSION_STEP_PROMPT.format(todo=todo)
+
 def get_execution_prompt(task, todo):
     """Return the formatted execution prompt for a TODO item."""
     return EXECUTION_PROMPT.format(task=task, todo=todo)
@@ -2,9 +2,139 @@
 ReAct reasoning loop for the Agentic AI system with Ollama LLaMA integration.
 """
 
-from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage
-from agent.prompts import REACT_REASON_PROMPT  # ✅ import from prompts, not from react_loop
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from agent import config
+from agent.prompts import REACT_REASON_PROMPT, get_react_session_prompts  # ✅ import from prompts, not from react_loop
+from agent.config import get_llm
+from agent.instrumentation import get_instrumentation
+
+
+def _build_llm():
+    """Return the shared Ollama model used for reasoning (see config.get_llm)."""
+    # OLLAMA_MODEL is "tinyllama"; you can change it to llama3 if needed
+    return get_llm(provider=config.REACT_PROVIDER, temperature=0.2)
+
+
+def _react_step(llm, task: str, todo: str):
+    """
+    Run one Reason -> Act -> Observe cycle for a single TODO.
+
+    Returns:
+        str: The observation (LLM response content)
+    """
+    # -----------------
+    # REASON
+    # -----------------
+    print(f"\n🧠 Reasoning on: {todo}")
+
+    # Format the reasoning prompt
+    prompt = REACT_REASON_PROMPT.format(
+        task=task,
+        todo=todo
+    )
+
+    # -----------------
+    # ACT (invoke LLM)
+    # -----------------
+    from langchain_core.messages import HumanMessage
+
+    with get_instrumentation().stage("react.step", config.REACT_PROVIDER) as span:
+        response = llm.invoke([
+            HumanMessage(content=prompt)
+        ])
+        span["usage"] = response
+
+    # -----------------
+    # OBSERVE
+    # -----------------
+    print("👀 Observation received")
+    return response.content
+
+
+# -----------------------------
+# ReAct session (prefix-stable prompts + bounded history)
+# -----------------------------
+class ReactSession:
+    """
+    Runs the TODOs of one task against a single warm model handle.
+
+    Every request starts with the same system message (rules + task), followed
+    by earlier (TODO, observation) turns and the current TODO. Because the
+    prefix never changes, Ollama can reuse its KV cache instead of re-evaluating
+    the whole prompt for each step.
+
+    History is bounded by `max_history` turns (default config.REACT_MAX_HISTORY).
+    When it is full, the oldest half is dropped at once so the cached prefix stays
+    valid for several steps instead of shifting on every step.
+    """
+
+    def __init__(self, task: str, llm=None, max_history: int = None):
+        from langchain_core.messages import SystemMessage
+
+        self.task = task
+        self.llm = llm or _build_llm()
+        self.max_history = config.REACT_MAX_HISTORY if max_history is None else max_history
+
+        system_prompt, _ = get_react_session_prompts(task, "")
+        self.prefix = [SystemMessage(content=system_prompt)]
+        self.history = []   # [(HumanMessage, AIMessage), ...]
+
+    def step(self, todo: str):
+        """
+        Run one Reason -> Act -> Observe cycle for `todo` and add it to the history.
+
+        Returns:
+            str: The observation (LLM response content)
+        """
+        observation, turn = self.run_turn(todo, self.history)
+        self._remember(turn)
+        return observation
+
+    def run_turn(self, todo: str, history: list):
+        """
+        Run one cycle for `todo` after the given (request, response) turns,
+        without touching the session history (safe to call from several threads).
+
+        Returns:
+            tuple: (observation, turn)
+        """
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        print(f"\n🧠 Reasoning on: {todo}")
+
+        _, step_prompt = get_react_session_prompts(self.task, todo)
+        request = HumanMessage(content=step_prompt)
+        messages = self.prefix + [message for turn in history for message in turn] + [request]
+
+        metrics = get_instrumentation()
+        with metrics.stage("react.step", config.REACT_PROVIDER) as span:
+            response = self.llm.invoke(messages)
+            span["usage"] = response
+
+        # Ollama reports how long it spent evaluating the (uncached part of the) prompt
+        prompt_eval = (getattr(response, "response_metadata", None) or {}).get("prompt_eval_duration")
+        if prompt_eval:
+            metrics.record("react.prompt_eval", prompt_eval / 1e9, config.REACT_PROVIDER)
+
+        print("👀 Observation received")
+        return response.content, (request, AIMessage(content=response.content))
+
+    def restore(self, todos: list, observations: list):
+        """Rebuild the history from earlier (TODO, observation) pairs, e.g. after a resume."""
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        for todo, observation in zip(todos, observations):
+            _, step_prompt = get_react_session_prompts(self.task, todo)
+            self._remember((HumanMessage(content=step_prompt), AIMessage(content=observation)))
+
+    def _remember(self, turn):
+        self.history.append(turn)
+        if self.max_history <= 0:
+            self.history.clear()
+        elif len(self.history) > self.max_history:
+            del self.history[:len(self.history) - self.max_history // 2]
 
 
 def react_loop(task: str, todos: list):
@@ -19,38 +149,157 @@ def react_loop(task: str, todos: list):
         str: Combined reasoning/execution responses for all TODOs
     """
 
+    # Combine all responses into one text block
+    return "\n\n".join(react_loop_stream(task, todos))
+
+
+def react_loop_stream(task: str, todos: list):
+    """
+    Streaming version of `react_loop`.
+
+    Args:
+        task (str): The main task description
+        todos (list): List of TODO items to execute
+
+    Yields:
+        str: The observation for each TODO, as soon as it completes
+    """
+
     # Initialize the Ollama model
-    llm = ChatOllama(
-        model="tinyllama",   # You can change to llama3 if needed
-        temperature=0.2
-    )
+    llm = _build_llm()
 
-    outputs = []
+    # Session mode: one stable prefix per task, earlier observations as history
+    if config.REACT_SESSION:
+        session = ReactSession(task, llm=llm)
+        for todo in todos:
+            yield session.step(todo)
+        return
 
     for todo in todos:
-        # -----------------
-        # REASON
-        # -----------------
-        print(f"\n🧠 Reasoning on: {todo}")
+        yield _react_step(llm, task, todo)
 
-        # Format the reasoning prompt
-        prompt = REACT_REASON_PROMPT.format(
-            task=task,
-            todo=todo
-        )
 
-        # -----------------
-        # ACT (invoke LLM)
-        # -----------------
-        response = llm.invoke([
-            HumanMessage(content=prompt)
-        ])
+# -----------------------------
+# Dependency-aware parallel execution
+# -----------------------------
 
-        # -----------------
-        # OBSERVE
-        # -----------------
-        print("👀 Observation received")
-        outputs.append(response.content)
+# "step 3", "steps 2 and 4", "steps 1-3", "Step 2 to 5"
+STEP_REFERENCE = re.compile(r"\bsteps?\s+(\d+)(?:\s*(?:-|–|to|and|,)\s*(\d+))?", re.IGNORECASE)
+
+# Phrases that tie a step to the one right before it
+PREVIOUS_STEP_MARKERS = (
+    "then ",
+    "after that",
+    "afterwards",
+    "previous step",
+    "from the above",
+    "based on the above",
+    "using the result",
+    "using the output",
+)
+
+# Phrases that tie a step to everything before it
+ALL_PREVIOUS_MARKERS = (
+    "finally",
+    "all previous",
+    "all of the above",
+    "everything above",
+)
+
+
+def infer_dependencies(todos: list):
+    """
+    Infer a dependency graph from the TODO text.
+
+    A step depends on earlier steps it names explicitly ("using the output of step 2"),
+    on the previous step when it is phrased as a continuation ("Then deploy ..."),
+    and on all earlier steps when it wraps up the plan ("Finally, ...").
+    Steps with no such cues are treated as independent.
+
+    Returns:
+        dict: {step_index: [indices of steps it depends on]} (0-based)
+    """
+    dependencies = {}
+
+    for i, todo in enumerate(todos):
+        lowered = todo.lower()
+        found = set()
+
+        for match in STEP_REFERENCE.finditer(todo):
+            start = int(match.group(1))
+            end = int(match.group(2) or start)
+            for number in range(start, end + 1):
+                # Only earlier steps count; forward references would create cycles
+                if 1 <= number <= i:
+                    found.add(number - 1)
+
+        # Explicit step references take precedence over phrasing cues
+        if i > 0 and not found:
+            if any(marker in lowered for marker in ALL_PREVIOUS_MARKERS):
+                found.update(range(i))
+            elif any(marker in lowered for marker in PREVIOUS_STEP_MARKERS):
+                found.add(i - 1)
+
+        dependencies[i] = sorted(found)
+
+    return dependencies
+
+
+def react_loop_parallel(task: str, todos: list, max_parallel: int = None, dependencies: dict = None):
+    """
+    Execute TODOs as a dependency graph, running independent steps concurrently.
+
+    Args:
+        task (str): The main task description
+        todos (list): List of TODO items to execute
+        max_parallel (int): Maximum number of concurrent Ollama requests, default
+            config.REACT_MAX_PARALLEL (the server only overlaps them up to its own OLLAMA_NUM_PARALLEL)
+        dependencies (dict): Optional declared graph {step_index: [step indices]} (0-based).
+            Inferred from the step text when omitted.
+
+    Returns:
+        str: Combined reasoning/execution responses, in the original TODO order
+    """
+    if dependencies is None:
+        dependencies = infer_dependencies(todos)
+    max_parallel = max_parallel or config.REACT_MAX_PARALLEL
+
+    llm = _build_llm()
+
+    # Session mode: shared prompt prefix; each step sees the turns of its dependencies
+    session = ReactSession(task, llm=llm) if config.REACT_SESSION else None
+    turns = {}
+
+    def run_step(i):
+        if session is None:
+            return _react_step(llm, task, todos[i]), None
+        history = [turns[d] for d in sorted(dependencies.get(i, []))]
+        # Same bound as ReactSession._remember ([-0:] would keep everything)
+        history = history[-session.max_history:] if session.max_history > 0 else []
+        return session.run_turn(todos[i], history)
+
+    outputs = [None] * len(todos)
+    waiting_on = {i: set(dependencies.get(i, [])) for i in range(len(todos))}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        running = {}
+
+        while waiting_on or running:
+            # Submit every step whose dependencies are all finished
+            ready = [i for i, deps in waiting_on.items() if not deps]
+            for i in ready:
+                del waiting_on[i]
+                running[pool.submit(run_step, i)] = i
+
+            if not running:
+                raise ValueError(f"Cyclic or invalid TODO dependencies: {waiting_on}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                outputs[i], turns[i] = future.result()
+                for deps in waiting_on.values():
+                    deps.discard(i)
 
     # Combine all responses into one text block
     return "\n\n".join(outputs)
@@ -1,34 +1,50 @@
 # run_experiment.py
 
 import os
-from dotenv import load_dotenv
 
 # -----------------------------
-# Load environment variables
+# Imports (LangSmith and the agent graph are loaded on first use)
 # -----------------------------
-load_dotenv()
-os.environ["LANGSMITH_TRACING_V2"] = "true"
-os.environ["LANGSMITH_PROJECT"] = "agentic-ai-infosys"
+from agent import config
+from agent.evaluators import EVALUATION_PROMPT_TEMPLATE
+from agent.instrumentation import get_instrumentation
+from agent.incremental import get_incremental_store, planner_fingerprint, judge_fingerprint, print_report
+from agent.task_index import get_task_index, load_or_build_langsmith, set_task_index
 
 # -----------------------------
-# Imports AFTER env setup
+# Environment setup for LangSmith runs
 # -----------------------------
-from langsmith import Client
-from langsmith.evaluation import evaluate
-from graph.graph import build_graph
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage
-from agent.evaluators import EVALUATION_PROMPT_TEMPLATE
+def configure_tracing():
+    """Load .env and enable LangSmith tracing unless it was configured explicitly."""
+    config.load_env()
+    os.environ.setdefault("LANGSMITH_TRACING_V2", "true")
+    os.environ.setdefault("LANGSMITH_PROJECT", "agentic-ai-infosys")
 
 # -----------------------------
-# Initialize LangSmith client
+# LangSmith client (created on first use so offline runs never contact the API)
 # -----------------------------
-client = Client()
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        from langsmith import Client
+        _client = Client()
+    return _client
 
 # -----------------------------
-# Build your agent graph
+# Build your agent graph (on first use)
 # -----------------------------
-graph = build_graph()
+_graph = None
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        from agent.graph import build_graph
+        # Experiments score the plan only; the evaluator runs as a LangSmith evaluator.
+        # Planning is a single node, so there is nothing to resume: skip checkpoints.
+        _graph = build_graph(execute=False, evaluate=False, checkpoint=False)
+    return _graph
 
 # -----------------------------
 # Function to safely extract input from dataset examples
@@ -79,82 +95,125 @@ def extract_user_input(example):
 
     return content or "No task provided"
 
+def get_task(example):
+    """
+    Return the task for an example: from the pre-extracted task index when one is
+    active, otherwise by parsing the payload with `extract_user_input`.
+    """
+    index = get_task_index()
+    if index is not None:
+        task = index.find(example)
+        if task is not None:
+            return task
+
+    # LangSmith passes Example objects to evaluators; parse their inputs
+    return extract_user_input(getattr(example, "inputs", example))
+
 # -----------------------------
 # Agent runner for LangSmith evaluation
 # -----------------------------
 def agent_runner(example):
-    user_input = extract_user_input(example)
+    with get_instrumentation().stage("agent_runner", config.PRIMARY_PROVIDER):
+        return _run_agent(example)
+
+def _run_agent(example):
+    user_input = get_task(example)
     print(f"\n[RUNNER] Processing task: {user_input}")
 
     # Send input through your agent graph
     state = {"messages": [{"role": "user", "content": user_input}]}
-    result = graph.invoke(state)
+
+    # Reuse the stored plan when input, planner prompt and model are unchanged
+    store = get_incremental_store()
+    if store is not None:
+        result = store.cached("planner", planner_fingerprint(user_input), lambda: get_graph().invoke(state))
+    else:
+        result = get_graph().invoke(state)
     print(f"[RUNNER] Result: {result.get('todos', [])[:2]}...")
     return result
 
+def agent_runner_batch(examples, max_concurrency=None):
+    """
+    Batched version of `agent_runner`: plans all examples with bounded concurrency.
+    Results come back in input order; a failed example carries an "error" key.
+    """
+    user_inputs = [get_task(example) for example in examples]
+    print(f"\n[RUNNER] Processing {len(user_inputs)} tasks in batch...")
+
+    states = [{"messages": [{"role": "user", "content": user_input}]} for user_input in user_inputs]
+    return get_graph().batch(states, max_concurrency=max_concurrency)
+
+# -----------------------------
+# Custom Evaluator for LangSmith
+# -----------------------------
+def task_plan_evaluator(run, example):
+    """
+    Comprehensive evaluator that returns multiple keys for dashboard alignment.
+    """
+    from agent.evaluators import PlanEvaluator, EvaluationResult
+    evaluator = PlanEvaluator()
+
+    user_request = get_task(example)
+
+    # Robustly get output from either our agent (todos) or a raw model run (output/text/string)
+    if isinstance(run.outputs, dict):
+        generated_plan = run.outputs.get("todos") or run.outputs.get("output") or run.outputs.get("text") or run.outputs.get("answer")
+    else:
+        generated_plan = run.outputs
+
+    def judge():
+        result = evaluator.evaluate(user_request, generated_plan)
+        if not result:
+            return None
+        s = result.overall if isinstance(result, EvaluationResult) else result.get("overall", 0.0)
+        return {
+            "results": [
+                {"key": "task_plan_quality", "score": float(s)},
+                {"key": "score", "score": float(s)},
+                {"key": "correctness", "score": float(s)},
+            ],
+            "comment": str(result),
+            # All five criteria, for local score analytics (agent.score_store)
+            "scores": result.model_dump() if isinstance(result, EvaluationResult) else dict(result),
+        }
+
+    # Reuse the stored score when input, plan, evaluator template and judge model are unchanged
+    store = get_incremental_store()
+    if store is not None:
+        feedback = store.cached("judge", judge_fingerprint(user_request, generated_plan), judge)
+    else:
+        feedback = judge()
+
+    if feedback:
+        return feedback
+    return {"score": 0.0, "comment": "Evaluation failed"}
+
 # -----------------------------
 # LLM test (offline check)
 # -----------------------------
 def test_model():
-    from agent.config import get_model_name, get_api_key, PRIMARY_PROVIDER
+    from langchain_core.messages import HumanMessage
+    from agent.config import get_model_name, get_llm
     model = get_model_name()
-    api_key = get_api_key()
     
-    print(f"🚀 Testing {PRIMARY_PROVIDER} LLM ({model})...")
+    print(f"🚀 Testing {config.PRIMARY_PROVIDER} LLM ({model})...")
     
-    if PRIMARY_PROVIDER == "groq":
-        from langchain_groq import ChatGroq
-        chat = ChatGroq(model=model, api_key=api_key)
-    elif PRIMARY_PROVIDER == "openai":
-        from langchain_openai import ChatOpenAI
-        chat = ChatOpenAI(model=model, api_key=api_key)
-    elif PRIMARY_PROVIDER == "anthropic":
-        from langchain_anthropic import ChatAnthropic
-        chat = ChatAnthropic(model=model, api_key=api_key)
-    else:
-        from langchain_groq import ChatGroq
-        chat = ChatGroq(model=model, api_key=api_key)
+    chat = get_llm()
         
     response = chat.invoke([HumanMessage(content="Explain ML in simple language using 4 points")])
-    print(f"{PRIMARY_PROVIDER} test output: {response.content[:100]}...")
+    print(f"{config.PRIMARY_PROVIDER} test output: {response.content[:100]}...")
 
 # -----------------------------
 # Run a small Groq test
 # -----------------------------
 if __name__ == "__main__":
-    test_model()
+    configure_tracing()
+    from langsmith.evaluation import evaluate
 
-    # -----------------------------
-    # Custom Evaluator for LangSmith
-    # -----------------------------
-    def task_plan_evaluator(run, example):
-        """
-        Comprehensive evaluator that returns multiple keys for dashboard alignment.
-        """
-        from agent.evaluators import PlanEvaluator, EvaluationResult
-        evaluator = PlanEvaluator()
-        
-        user_request = extract_user_input(example)
-        
-        # Robustly get output from either our agent (todos) or a raw model run (output/text/string)
-        if isinstance(run.outputs, dict):
-            generated_plan = run.outputs.get("todos") or run.outputs.get("output") or run.outputs.get("text") or run.outputs.get("answer")
-        else:
-            generated_plan = run.outputs
+    test_model()
 
-        result = evaluator.evaluate(user_request, generated_plan)
-        
-        if result:
-            s = result.overall if isinstance(result, EvaluationResult) else result.get("overall", 0.0)
-            return {
-                "results": [
-                    {"key": "task_plan_quality", "score": float(s)},
-                    {"key": "score", "score": float(s)},
-                    {"key": "correctness", "score": float(s)},
-                ],
-                "comment": str(result)
-            }
-        return {"score": 0.0, "comment": "Evaluation failed"}
+    # Normalize the dataset once; runner and evaluator then look tasks up in O(1)
+    set_task_index(load_or_build_langsmith("ds-granular-oleo-34", client=get_client()))
 
     # -----------------------------
     # Run LangSmith evaluation
@@ -163,9 +222,19 @@ if __name__ == "__main__":
     evaluate(
         agent_runner,
         data="ds-granular-oleo-34",
-        client=client,
+        client=get_client(),
         evaluators=[task_plan_evaluator],
         experiment_prefix="stupendous-cloth-23-SOLVED"
     )
 
     print("\n✅ Experiment completed! Check LangSmith dashboard")
+
+    # Which planner / judge results were recomputed and which were reused
+    store = get_incremental_store()
+    if store is not None:
+        print_report(store.report())
+
+    # Per-stage latency / token / cost report
+    if config.METRICS_PATH:
+        get_instrumentation().write(config.METRICS_PATH)
+        print(f"📈 Metrics written to {config.METRICS_PATH}")
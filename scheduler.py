@@ -0,0 +1,333 @@
+# agent/scheduler.py
+
+"""
+Shared, rate-limit-aware scheduler for LLM requests.
+
+Every chat model from `config.get_llm` is wrapped in a ScheduledChatModel, so
+planner, evaluator and ReAct calls all pass through one RequestScheduler:
+
+- per-provider token buckets for requests per minute and tokens per minute
+- adaptive concurrency (AIMD): halve the limit on 429 / Retry-After, pause the
+  provider for the advertised time, then ramp back up on successes
+- priority lanes: requests made inside `interactive()` (e.g. main.py) are
+  admitted before bulk experiment traffic
+
+Importing this module does not load LangChain: ScheduledChatModel is built on
+first access, so `from agent.scheduler import interactive` stays cheap.
+"""
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Iterator, List, Optional
+
+from agent import config
+from agent.instrumentation import get_instrumentation, usage_from
+
+# -----------------------------
+# Priority lanes
+# -----------------------------
+INTERACTIVE = 0
+BULK = 1
+
+_lane = contextvars.ContextVar("scheduler_lane", default=BULK)
+
+
+@contextlib.contextmanager
+def interactive():
+    """Run LLM calls made inside this block in the interactive (high priority) lane."""
+    token = _lane.set(INTERACTIVE)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+# -----------------------------
+# Rate limit primitives
+# -----------------------------
+class TokenBucket:
+    """
+    Token bucket refilled at `per_minute / 60` per second (0 = unlimited).
+    Reservations may overdraw the bucket; the caller waits out the deficit.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return how many seconds to wait before using it."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation once the real amount is known."""
+        if not self.rate:
+            return
+        with self._lock:
+            self.tokens -= amount
+
+
+def rate_limit_delay(error: Exception):
+    """
+    Return the Retry-After delay in seconds for a rate-limit error, 0.0 for a
+    rate-limit error without the header, or None for any other error.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError":
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return 0.0
+
+
+class ProviderScheduler:
+    """
+    Admission control for one provider: priority queue, adaptive concurrency
+    limit, Retry-After pauses and request/token buckets.
+    """
+
+    def __init__(self, provider: str, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def acquire(self, priority: int):
+        """Block until this request may start; lower `priority` values go first."""
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                now = time.monotonic()
+                if self._waiting[0] == entry and self.in_flight < int(self.limit) and now >= self.paused_until:
+                    break
+                self._cond.wait(self.paused_until - now if self.paused_until > now else None)
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        # Additive increase: about +1 slot per `limit` successful requests
+        with self._cond:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_rate_limited(self, delay: float):
+        # Multiplicative decrease, and hold every lane until Retry-After has passed
+        with self._cond:
+            self.throttled += 1
+            self.limit = max(1.0, self.limit / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiting),
+                "throttled": self.throttled,
+            }
+
+
+class RequestScheduler:
+    """
+    Process-wide scheduler: one ProviderScheduler per provider.
+    """
+
+    def __init__(self):
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def provider(self, name: str) -> ProviderScheduler:
+        with self._lock:
+            if name not in self._providers:
+                requests_per_minute, tokens_per_minute = config.LLM_RATE_LIMITS.get(name, (0, 0))
+                self._providers[name] = ProviderScheduler(
+                    name, requests_per_minute, tokens_per_minute, config.SCHEDULER_MAX_CONCURRENCY
+                )
+            return self._providers[name]
+
+    def call(self, provider: str, fn, estimated_tokens: int = 0):
+        """
+        Run `fn()` for `provider` once admitted, retrying rate-limit errors
+        (up to config.SCHEDULER_MAX_RETRIES) with Retry-After or exponential backoff.
+
+        Queueing and backoff time is recorded as the "scheduler.wait" stage.
+        """
+        limiter = self.provider(provider)
+        priority = _lane.get()
+        waited = 0.0
+        retries = 0
+
+        try:
+            while True:
+                start = time.perf_counter()
+                limiter.acquire(priority)
+                try:
+                    delay = max(limiter.requests.reserve(1), limiter.tokens.reserve(estimated_tokens))
+                    if delay:
+                        time.sleep(delay)
+                    waited += time.perf_counter() - start
+
+                    try:
+                        result = fn()
+                    except Exception as e:
+                        retry_after = rate_limit_delay(e)
+                        if retry_after is None or retries >= config.SCHEDULER_MAX_RETRIES:
+                            raise
+                        backoff = retry_after or min(60.0, 2 ** retries) * (0.5 + random.random())
+                        limiter.on_rate_limited(backoff)
+                        retries += 1
+                        continue
+
+                    limiter.on_success()
+                    return result
+                finally:
+                    limiter.release()
+        finally:
+            get_instrumentation().record("scheduler.wait", waited, provider, retries=retries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            providers = list(self._providers.items())
+        return {name: limiter.snapshot() for name, limiter in providers}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide RequestScheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+# -----------------------------
+# Chat model wrapper
+# -----------------------------
+def _estimate_tokens(messages) -> int:
+    # ~4 characters per token for the prompt, plus the expected completion
+    prompt_chars = sum(len(str(message.content)) for message in messages)
+    return prompt_chars // 4 + config.SCHEDULER_COMPLETION_TOKENS
+
+
+def _build_scheduled_chat_model():
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import BaseMessage
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class ScheduledChatModel(BaseChatModel):
+        """
+        Chat model that sends every request for `inner` through the shared scheduler.
+        """
+
+        inner: Any
+        provider: str
+
+        @property
+        def _llm_type(self) -> str:
+            return f"scheduled-{self.provider}"
+
+        def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+            estimated = _estimate_tokens(messages)
+            scheduler = get_scheduler()
+            message = scheduler.call(
+                self.provider,
+                lambda: self.inner.invoke(messages, stop=stop, **kwargs),
+                estimated_tokens=estimated,
+            )
+
+            # Settle the token bucket with the real usage when the provider reports it
+            prompt_tokens, completion_tokens = usage_from(message)
+            if prompt_tokens or completion_tokens:
+                scheduler.provider(self.provider).tokens.adjust(prompt_tokens + completion_tokens - estimated)
+
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _stream(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any,
+        ) -> Iterator[ChatGenerationChunk]:
+            # Admission covers opening the stream and its first chunk, which is where
+            # rate-limit errors surface; the rest of the stream is read afterwards.
+            def start():
+                chunks = iter(self.inner.stream(messages, stop=stop, **kwargs))
+                return chunks, next(chunks, None)
+
+            chunks, first = get_scheduler().call(self.provider, start, estimated_tokens=_estimate_tokens(messages))
+            if first is None:
+                return
+            yield ChatGenerationChunk(message=first)
+            for chunk in chunks:
+                yield ChatGenerationChunk(message=chunk)
+
+    return ScheduledChatModel
+
+
+def __getattr__(name: str):
+    # ScheduledChatModel is built on first access so importing the scheduler stays cheap
+    if name == "ScheduledChatModel":
+        globals()["ScheduledChatModel"] = _build_scheduled_chat_model()
+        return globals()["ScheduledChatModel"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,272 @@
+# agent/score_store.py
+
+"""
+Columnar store for per-example evaluation scores, with vectorized analytics.
+
+Each experiment is a directory of NumPy arrays, one .npy file per column:
+
+    example_key          uint64   stable hash of the example id (joins experiments)
+    relevance ... overall float32  the five EvaluationResult fields (NaN = not scored)
+    latency              float32  seconds per example
+    prompt_tokens        int32
+    completion_tokens    int32
+
+Columns are memory-mapped on load, and means, percentiles, bootstrap confidence
+intervals and paired experiment-vs-experiment deltas are computed with NumPy,
+in milliseconds over 100k rows.
+
+Usage:
+    python -m agent.score_store summary exp-a exp-b --root .cache/scores
+    python -m agent.score_store delta exp-a exp-b --column overall
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+SCORE_COLUMNS = ["relevance", "completeness", "clarity", "actionability", "overall"]
+
+COLUMNS = {
+    "example_key": np.uint64,
+    **{name: np.float32 for name in SCORE_COLUMNS},
+    "latency": np.float32,
+    "prompt_tokens": np.int32,
+    "completion_tokens": np.int32,
+}
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+# Above this many distinct values the bootstrap resamples groups of sorted values
+MAX_DISTINCT_FOR_COUNTS = 1024
+
+
+def example_key(example_id) -> int:
+    """64-bit key for an example id, shared by every experiment."""
+    digest = hashlib.blake2b(str(example_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+# -----------------------------
+# Vectorized statistics
+# -----------------------------
+def bootstrap_ci(values, n_resamples: int = 1000, confidence: float = 0.95, seed: int = 0):
+    """
+    Percentile bootstrap confidence interval of the mean (NaNs ignored).
+
+    Scores take few distinct values, so resampling is done on value counts
+    rather than rows, at a cost independent of the number of rows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n == 0:
+        return (float("nan"), float("nan"))
+
+    rng = np.random.default_rng(seed)
+    distinct, counts = np.unique(values, return_counts=True)
+
+    if len(distinct) > MAX_DISTINCT_FOR_COUNTS:
+        # Continuous columns (latency, tokens): collapse the sorted values into
+        # equal-size groups represented by their means. The resampled means
+        # differ from a full bootstrap only by within-group spread.
+        groups = np.array_split(np.sort(values), MAX_DISTINCT_FOR_COUNTS)
+        distinct = np.array([group.mean() for group in groups])
+        counts = np.array([len(group) for group in groups])
+
+    # Poisson bootstrap: independent Poisson(count) weights per distinct value,
+    # the standard large-sample equivalent of a multinomial resample
+    weights = rng.poisson(counts, size=(n_resamples, len(distinct)))
+    totals = weights.sum(axis=1)
+    # An empty resample (all weights 0, likely for small n) has no mean; drop it
+    # rather than counting it as 0
+    nonempty = totals > 0
+    if not nonempty.any():
+        return (float(values.mean()), float(values.mean()))
+    means = weights[nonempty] @ distinct / totals[nonempty]
+
+    alpha = (1.0 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1.0 - alpha])
+    return (float(low), float(high))
+
+
+def describe(values, percentiles=DEFAULT_PERCENTILES, n_resamples: int = 1000) -> dict:
+    """Mean, percentiles and bootstrap CI of one column (NaNs ignored)."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = values[~np.isnan(values)]
+    if not len(valid):
+        return {"count": 0}
+
+    stats = {"count": int(len(valid)), "mean": float(valid.mean())}
+    for q, value in zip(percentiles, np.percentile(valid, percentiles)):
+        stats[f"p{q}"] = float(value)
+    stats["ci95"] = bootstrap_ci(valid, n_resamples=n_resamples)
+    return stats
+
+
+# -----------------------------
+# Store
+# -----------------------------
+class ScoreStore:
+    """
+    Directory of experiments, one subdirectory of column files per experiment.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _dir(self, experiment: str) -> str:
+        return os.path.join(self.root, experiment)
+
+    def experiments(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "meta.json"))
+        )
+
+    def write(self, experiment: str, rows: list, append: bool = False):
+        """
+        Store per-example rows for `experiment`.
+
+        Each row is a dict with "id" and any of the score, latency and token
+        columns; missing scores are stored as NaN, missing counts as 0.
+        With `append`, rows are added to the existing columns.
+        """
+        columns = {
+            "example_key": np.array([example_key(row["id"]) for row in rows], dtype=np.uint64),
+        }
+        for name, dtype in COLUMNS.items():
+            if name == "example_key":
+                continue
+            missing = np.nan if np.issubdtype(dtype, np.floating) else 0
+            columns[name] = np.array(
+                [missing if row.get(name) is None else row[name] for row in rows], dtype=dtype
+            )
+
+        if append and os.path.exists(os.path.join(self._dir(experiment), "meta.json")):
+            existing = self.load(experiment)
+            columns = {name: np.concatenate([existing[name], columns[name]]) for name in COLUMNS}
+
+        # Rows are kept sorted by example_key so experiments join with a binary search
+        order = np.argsort(columns["example_key"], kind="stable")
+        columns = {name: array[order] for name, array in columns.items()}
+
+        directory = self._dir(experiment)
+        os.makedirs(directory, exist_ok=True)
+        for name, array in columns.items():
+            # Write-then-rename so readers never see a half-written column
+            tmp_path = os.path.join(directory, f".{name}.npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": int(len(columns["example_key"])), "updated_at": time.time()}, f)
+
+    def load(self, experiment: str, columns: list = None) -> dict:
+        """Return {column: memory-mapped array} for an experiment."""
+        directory = self._dir(experiment)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            raise KeyError(f"Unknown experiment: {experiment}")
+        return {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in (columns or COLUMNS)
+        }
+
+    # -----------------------------
+    # Analytics
+    # -----------------------------
+    def summary(self, experiment: str, columns: list = None, percentiles=DEFAULT_PERCENTILES) -> dict:
+        """Per-column mean, percentiles and 95% bootstrap CI."""
+        columns = columns or [name for name in COLUMNS if name != "example_key"]
+        data = self.load(experiment, columns)
+        return {name: describe(data[name], percentiles) for name in columns}
+
+    def compare(self, experiments: list, column: str = "overall") -> dict:
+        """`describe` of one column for several experiments."""
+        return {name: describe(self.load(name, [column])[column]) for name in experiments}
+
+    def paired_delta(self, baseline: str, candidate: str, column: str = "overall", n_resamples: int = 1000) -> dict:
+        """
+        Per-example difference `candidate - baseline` on the examples both scored.
+        Returns the mean delta with a bootstrap CI and win / loss / tie counts.
+        """
+        base = self.load(baseline, ["example_key", column])
+        cand = self.load(candidate, ["example_key", column])
+
+        # Both key columns are sorted: find each candidate key in the baseline
+        base_keys, cand_keys = base["example_key"], cand["example_key"]
+        positions = np.minimum(np.searchsorted(base_keys, cand_keys), max(len(base_keys) - 1, 0))
+        matched = base_keys[positions] == cand_keys if len(base_keys) else np.zeros(len(cand_keys), dtype=bool)
+
+        deltas = (
+            cand[column][matched].astype(np.float64)
+            - base[column][positions[matched]].astype(np.float64)
+        )
+        deltas = deltas[~np.isnan(deltas)]
+        if not len(deltas):
+            return {"pairs": 0}
+
+        return {
+            "pairs": int(len(deltas)),
+            "mean_delta": float(deltas.mean()),
+            "ci95": bootstrap_ci(deltas, n_resamples=n_resamples),
+            "wins": int((deltas > 0).sum()),
+            "losses": int((deltas < 0).sum()),
+            "ties": int((deltas == 0).sum()),
+        }
+
+
+def rows_from_records(records: list) -> list:
+    """Convert local_runner checkpoint records into ScoreStore rows."""
+    rows = []
+    for record in records:
+        scores = record.get("scores") or {}
+        if not scores:
+            # Older records only carry the overall score
+            for item in record.get("feedback") or []:
+                if item.get("key") == "score":
+                    scores = {"overall": item.get("score")}
+        rows.append({
+            "id": record["id"],
+            **{name: scores.get(name) for name in SCORE_COLUMNS},
+            "latency": record.get("duration"),
+            "prompt_tokens": record.get("prompt_tokens"),
+            "completion_tokens": record.get("completion_tokens"),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze experiment scores")
+    parser.add_argument("--root", default=".cache/scores", help="Score store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = commands.add_parser("summary", help="Per-column statistics of experiments")
+    summary_parser.add_argument("experiments", nargs="*", help="Experiments (default: all)")
+
+    delta_parser = commands.add_parser("delta", help="Paired candidate - baseline deltas")
+    delta_parser.add_argument("baseline")
+    delta_parser.add_argument("candidate")
+    delta_parser.add_argument("--column", default="overall")
+
+    args = parser.parse_args()
+    store = ScoreStore(args.root)
+
+    started = time.perf_counter()
+    if args.command == "summary":
+        result = {name: store.summary(name) for name in (args.experiments or store.experiments())}
+    else:
+        result = store.paired_delta(args.baseline, args.candidate, column=args.column)
+
+    print(json.dumps(result, indent=2))
+    print(f"⏱️ {1000 * (time.perf_counter() - started):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
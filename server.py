@@ -0,0 +1,371 @@
+# agent/server.py
+
+"""
+Long-running planner service with request micro-batching.
+
+Keeps one warm TaskPlanner, PlanEvaluator and ReAct (Ollama) handle for the
+life of the process. Concurrent /plan, /evaluate and /react requests are merged
+into micro-batches (collected for up to SERVER_BATCH_WINDOW_MS, at most
+SERVER_MAX_BATCH per batch) and sent through `generate_todos` /
+`evaluate_many` / one batched ReAct call. Up to SERVER_MAX_INFLIGHT_BATCHES
+batches per endpoint run at once, so a slow batch does not hold up the next.
+Each endpoint has a bounded queue; when it is full the request is rejected
+with 503 and a Retry-After header instead of piling up.
+
+Endpoints:
+    POST /plan      {"task": "..."}                    -> {"todos": [...]}
+    POST /evaluate  {"task": "...", "plan": [...]}     -> {"relevance": ..., "overall": ...}
+    POST /react     {"task": "...", "todos": [...]}    -> {"observations": [...]}
+    GET  /stats     queue depth, batch sizes and latency percentiles per endpoint
+    GET  /health
+
+Usage:
+    python -m agent.server --port 8765
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent import config
+from agent.instrumentation import Histogram, PERCENTILES, get_instrumentation
+from agent.scheduler import interactive
+
+
+class QueueFull(RuntimeError):
+    """Raised when a micro-batcher's queue is at capacity."""
+
+
+# -----------------------------
+# Micro-batching
+# -----------------------------
+class MicroBatcher:
+    """
+    Collects submitted items on a bounded queue and hands them to `handler`
+    in batches, running up to `max_inflight` batches at once. `handler(items)`
+    must return one result per item, in order; a result that is an exception
+    is raised to that item's caller only. If the handler itself raises, every
+    item of that batch fails. While `max_inflight` batches are running, new
+    items wait on the queue.
+    """
+
+    def __init__(self, name: str, handler, window: float, max_batch: int, max_queue: int, max_inflight: int = 1):
+        self.name = name
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self.max_inflight = max(1, max_inflight)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_inflight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix=f"batch-{name}")
+        self.inflight = 0
+
+        self.queue_wait = Histogram()
+        self.latency = Histogram()
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.errors = 0
+
+        self._worker = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, item) -> Future:
+        """Queue `item` for the next batch. Raises QueueFull instead of blocking."""
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"{self.name} queue is full ({self._queue.maxsize} pending)")
+        return future
+
+    def _collect(self) -> list:
+        """Block for the first item, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Wait for a free slot first, so items keep queueing (and backpressure applies) meanwhile
+            self._slots.acquire()
+            batch = self._collect()
+            with self._lock:
+                self.inflight += 1
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: list):
+        started = time.perf_counter()
+        try:
+            try:
+                # Callers are waiting on these: admit ahead of any bulk traffic
+                with interactive(), get_instrumentation().stage(f"server.{self.name}.batch"):
+                    results = self.handler([item for item, _, _ in batch])
+            except BaseException as e:
+                # Including non-Exception errors: a lost batch would leave its
+                # callers hanging until timeout
+                results = [e] * len(batch)
+
+            finished = time.perf_counter()
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                for _, _, queued_at in batch:
+                    self.queue_wait.add(started - queued_at)
+                for (_, future, queued_at), result in zip(batch, results):
+                    self.latency.add(finished - queued_at)
+                    if isinstance(result, BaseException):
+                        self.errors += 1
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "inflight_batches": self.inflight,
+                "max_inflight_batches": self.max_inflight,
+                "requests": self.items,
+                "batches": self.batches,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "rejected": self.rejected,
+                "errors": self.errors,
+            }
+            for q in PERCENTILES:
+                data[f"latency_p{int(q * 100)}"] = self.latency.percentile(q)
+                data[f"queue_wait_p{int(q * 100)}"] = self.queue_wait.percentile(q)
+            return data
+
+
+# -----------------------------
+# Warm service
+# -----------------------------
+class PlannerService:
+    """
+    Warm planner/evaluator handles behind one micro-batcher per endpoint.
+    """
+
+    def __init__(
+        self,
+        window: float = None,
+        max_batch: int = None,
+        max_queue: int = None,
+        warm: bool = True,
+        max_inflight: int = None,
+    ):
+        from agent.planner import TaskPlanner
+        from agent.evaluators import PlanEvaluator
+        from agent.react_loop import _build_llm
+
+        window = config.SERVER_BATCH_WINDOW_MS / 1000 if window is None else window
+        max_batch = max_batch or config.SERVER_MAX_BATCH
+        max_queue = max_queue or config.SERVER_MAX_QUEUE
+        max_inflight = max_inflight or config.SERVER_MAX_INFLIGHT_BATCHES
+
+        self.planner = TaskPlanner()
+        self.evaluator = PlanEvaluator()
+        # The same shared model the ReAct loop uses, so warming it warms /react
+        self.react_llm = _build_llm()
+        if warm:
+            self._warm_up()
+
+        self.started_at = time.time()
+        self.batchers = {
+            name: MicroBatcher(name, handler, window, max_batch, max_queue, max_inflight)
+            for name, handler in [
+                ("plan", self._plan_batch),
+                ("evaluate", self._evaluate_batch),
+                ("react", self._react_batch),
+            ]
+        }
+
+    def _warm_up(self):
+        """Load the local ReAct model now (and keep it loaded) rather than on the first request."""
+        if config.REACT_PROVIDER != "ollama":
+            return
+        try:
+            self.react_llm.invoke("ping")
+            print(f"🔥 Ollama model warm ({config.OLLAMA_MODEL}, keep_alive={config.OLLAMA_KEEP_ALIVE})")
+        except Exception as e:
+            print(f"⚠️ Could not warm Ollama: {e}")
+
+    def _plan_batch(self, tasks: list) -> list:
+        # Identical tasks in one window are planned once
+        unique = list(dict.fromkeys(tasks))
+        plans = dict(zip(unique, self.planner.generate_todos(unique, max_concurrency=config.SERVER_MAX_BATCH)))
+        return [plans[task] for task in tasks]
+
+    def _evaluate_batch(self, items: list) -> list:
+        results = self.evaluator.evaluate_many(items, max_concurrency=config.SERVER_MAX_BATCH)
+        return [
+            result if result is not None else RuntimeError("evaluation failed")
+            for result in results
+        ]
+
+    def _react_batch(self, items: list) -> list:
+        """
+        One Reason -> Act -> Observe turn per TODO, every TODO of the window in one
+        batched call (self-contained prompts, as with REACT_SESSION=false).
+        """
+        from langchain_core.messages import HumanMessage
+        from agent.prompts import REACT_REASON_PROMPT
+
+        prompts = [
+            [HumanMessage(content=REACT_REASON_PROMPT.format(task=task, todo=todo))]
+            for task, todos in items
+            for todo in todos
+        ]
+        with get_instrumentation().stage("react.batch", config.REACT_PROVIDER):
+            responses = self.react_llm.batch(
+                prompts, config={"max_concurrency": config.REACT_MAX_PARALLEL}, return_exceptions=True
+            )
+
+        results, offset = [], 0
+        for _, todos in items:
+            own = responses[offset:offset + len(todos)]
+            offset += len(todos)
+            failed = next((response for response in own if isinstance(response, Exception)), None)
+            results.append(failed if failed is not None else [response.content for response in own])
+        return results
+
+    def call(self, endpoint: str, item, timeout: float = None):
+        """Submit one request to `endpoint`'s batcher and wait for its result."""
+        timeout = config.SERVER_REQUEST_TIMEOUT if timeout is None else timeout
+        return self.batchers[endpoint].submit(item).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        from agent.scheduler import get_scheduler
+
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "endpoints": {name: batcher.stats() for name, batcher in self.batchers.items()},
+            "scheduler": get_scheduler().stats(),
+            "stages": get_instrumentation().snapshot(),
+        }
+
+
+# -----------------------------
+# HTTP front end
+# -----------------------------
+def _make_handler(service: PlannerService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, service.stats())
+            elif self.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                task = body["task"]
+            except (ValueError, KeyError, TypeError):
+                self._send(400, {"error": 'expected a JSON body with a "task" field'})
+                return
+
+            try:
+                if self.path == "/plan":
+                    self._send(200, {"todos": service.call("plan", task)})
+                elif self.path == "/evaluate":
+                    result = service.call("evaluate", (task, body.get("plan") or []))
+                    self._send(200, result.model_dump())
+                elif self.path == "/react":
+                    observations = service.call("react", (task, list(body.get("todos") or [])))
+                    self._send(200, {"observations": observations})
+                else:
+                    self._send(404, {"error": f"unknown path {self.path}"})
+            except QueueFull as e:
+                self._send(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            except TimeoutError:
+                self._send(504, {"error": "request timed out"})
+            except BaseException as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass  # Per-request logs would dominate output under load; see /stats
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) drops connections under bursts before they reach the queue
+    request_queue_size = 128
+
+
+def serve(host: str = None, port: int = None, service: PlannerService = None):
+    """Build the service and serve HTTP until interrupted."""
+    service = service or PlannerService()
+    host = host or config.SERVER_HOST
+    port = config.SERVER_PORT if port is None else port
+
+    server = _Server((host, port), _make_handler(service))
+    print(f"🚀 Planner service listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the planner and evaluator over HTTP with micro-batching.")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--window-ms", type=float, default=None, help="Micro-batch collection window")
+    parser.add_argument("--max-batch", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=None, help="Pending requests per endpoint before 503")
+    parser.add_argument("--max-inflight", type=int, default=None, help="Batches per endpoint running at once")
+    parser.add_argument("--no-warm", action="store_true", help="Skip loading the Ollama model at startup")
+    args = parser.parse_args()
+
+    config.load_env()
+    service = PlannerService(
+        window=None if args.window_ms is None else args.window_ms / 1000,
+        max_batch=args.max_batch,
+        max_queue=args.max_queue,
+        warm=not args.no_warm,
+        max_inflight=args.max_inflight,
+    )
+    serve(args.host, args.port, service)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# agent/similarity.py
+
+"""
+Near-duplicate index over previously planned tasks.
+
+Tasks are reduced to character 3-gram shingles (lowercased, punctuation and
+spaces removed, so "web site" and "website" match) and a MinHash signature.
+Locality-sensitive hashing splits the signature into bands; tasks sharing a
+band are candidates, and candidates are ranked by the exact Jaccard similarity
+of their shingles. Band keys live in an indexed SQLite table, so lookups stay
+well under a millisecond with hundreds of thousands of stored tasks and
+several processes can share one index. No GPU or network is needed.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from typing import NamedTuple, Optional
+
+from agent import config
+
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+
+# Fixed seed: signatures must be identical across processes and runs
+_MASKS = random.Random(1234).sample(range(1, 2 ** 32), NUM_BANDS * ROWS_PER_BAND)
+
+# Candidates verified with the exact Jaccard similarity per lookup
+MAX_CANDIDATES = 8
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+class SimilarTask(NamedTuple):
+    task: str
+    steps: list
+    score: float   # Jaccard similarity of the task shingles (0.0 - 1.0)
+
+
+def shingles(text: str) -> frozenset:
+    """Character 3-grams of the normalized text."""
+    normalized = _NON_ALNUM.sub("", text.lower())
+    if len(normalized) < 3:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set: frozenset) -> list:
+    """MinHash signature: one CRC32 per shingle, permuted by XOR with fixed masks."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    return [min(h ^ mask for h in hashes) for mask in _MASKS]
+
+
+def band_keys(signature: list, scope: str) -> list:
+    """One signed 64-bit key per LSH band, namespaced by `scope`."""
+    keys = []
+    prefix = scope.encode("utf-8")
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            prefix + struct.pack(f"<B{ROWS_PER_BAND}I", band, *rows), digest_size=8
+        ).digest()
+        keys.append(struct.unpack("<q", digest)[0])
+    return keys
+
+
+class SimilarityIndex:
+    """
+    SQLite-backed MinHash LSH index of (task, plan) pairs.
+
+    `scope` (e.g. provider, model and temperature) keeps plans from different
+    model settings apart.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                scope TEXT NOT NULL,
+                task TEXT NOT NULL,
+                steps TEXT NOT NULL,
+                UNIQUE (scope, task)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bands (
+                band_key INTEGER NOT NULL,
+                task_id INTEGER NOT NULL,
+                PRIMARY KEY (band_key, task_id)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def _connect(self):
+        """Return a per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, task: str, steps: list, scope: str = ""):
+        """Store the plan for `task` (replacing an earlier plan for the same task)."""
+        self.add_many([(task, steps)], scope=scope)
+
+    def add_many(self, items, scope: str = ""):
+        """Store many (task, steps) pairs in one transaction (for bulk imports)."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for task, steps in items:
+                payload = json.dumps(steps, ensure_ascii=False)
+                row = conn.execute("SELECT id FROM tasks WHERE scope = ? AND task = ?", (scope, task)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE tasks SET steps = ? WHERE id = ?", (payload, row[0]))
+                    continue
+
+                task_id = conn.execute(
+                    "INSERT INTO tasks (scope, task, steps) VALUES (?, ?, ?)", (scope, task, payload)
+                ).lastrowid
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bands (band_key, task_id) VALUES (?, ?)",
+                    [(key, task_id) for key in band_keys(minhash(shingles(task)), scope)],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query(self, task: str, scope: str = "", threshold: float = 0.0) -> Optional[SimilarTask]:
+        """
+        Return the most similar stored task with score >= `threshold`, or None.
+        """
+        query_shingles = shingles(task)
+        if not query_shingles:
+            return None
+        keys = band_keys(minhash(query_shingles), scope)
+
+        conn = self._connect()
+        placeholders = ",".join("?" * len(keys))
+        # Candidates sharing the most bands are the likeliest near-duplicates
+        candidates = conn.execute(
+            f"""
+            SELECT task_id FROM bands WHERE band_key IN ({placeholders})
+            GROUP BY task_id ORDER BY COUNT(*) DESC LIMIT {MAX_CANDIDATES}
+            """,
+            keys,
+        ).fetchall()
+        if not candidates:
+            return None
+
+        best = None
+        rows = conn.execute(
+            f"SELECT task, steps FROM tasks WHERE id IN ({','.join('?' * len(candidates))})",
+            [task_id for (task_id,) in candidates],
+        ).fetchall()
+        for stored_task, steps in rows:
+            score = jaccard(query_shingles, shingles(stored_task))
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, stored_task, steps)
+
+        if best is None:
+            return None
+        score, stored_task, steps = best
+        return SimilarTask(task=stored_task, steps=json.loads(steps), score=round(score, 4))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+
+_similarity_index = None
+_similarity_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """
+    Return the shared SimilarityIndex, or None when SIMILARITY_INDEX_PATH is not set.
+    """
+    global _similarity_index
+    if not config.SIMILARITY_INDEX_PATH:
+        return None
+
+    with _similarity_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex(config.SIMILARITY_INDEX_PATH)
+    return _similarity_index
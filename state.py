@@ -1,6 +1,11 @@
-from typing import TypedDict, List
+from typing import TypedDict, List, Optional
 
-class AgentState(TypedDict):
+class AgentState(TypedDict, total=False):
     task: str
     todos: List[str]
     final_output: str
+
+    # Execution progress (checkpointed after every node)
+    step: int                    # Index of the next TODO to execute
+    observations: List[str]      # One ReAct observation per executed TODO
+    evaluation: Optional[dict]   # PlanEvaluator scores for the plan
@@ -0,0 +1,135 @@
+# agent/stub_llm.py
+
+"""
+Deterministic local chat model used when PRIMARY_LLM_PROVIDER=stub.
+
+It answers planner, evaluator and ReAct prompts with canned but task-dependent
+output, so experiments can run on CI or a laptop with no network and no API keys.
+"""
+
+import hashlib
+import json
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Action verbs used to build stub plans (mirrors the rule in TASK_PLANNER_PROMPT)
+STUB_VERBS = ["Research", "Design", "Set up", "Implement", "Test", "Review", "Deploy", "Document"]
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline chat model with deterministic output.
+    """
+
+    model: str = "stub-model"
+    temperature: Optional[float] = None
+    latency: float = 0.0      # Seconds to sleep per request (simulated network time)
+    num_steps: int = 5        # Number of steps in generated plans
+    filler_words: int = 0     # Extra words per plan step / observation (scales token output)
+    error_rate: float = 0.0   # Fraction of requests that fail (simulated provider errors)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    # -----------------------------
+    # Canned responses
+    # -----------------------------
+    @staticmethod
+    def _seed(text: str) -> int:
+        return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+    def _plan(self, prompt: str) -> str:
+        # The planner prompt ends with "Task:\n{task}\n\nProvide the numbered plan below:"
+        task = prompt.split("Task:", 1)[-1].split("Provide the numbered plan", 1)[0].strip()
+        offset = self._seed(task) % len(STUB_VERBS)
+        lines = []
+        for i in range(self.num_steps):
+            verb = STUB_VERBS[(offset + i) % len(STUB_VERBS)]
+            lines.append(f"{i + 1}. {verb} {task.lower()} (part {i + 1}){self._filler()}")
+        return "\n".join(lines)
+
+    def _scores(self, prompt: str) -> str:
+        seed = self._seed(prompt)
+        # With a temperature, scores vary between calls like a real judge's;
+        # how much depends on the plan, so some plans are stable and others not
+        jitter = (self.temperature or 0.0) * (seed % 5) / 20
+        scores = {}
+        for i, key in enumerate(["relevance", "completeness", "clarity", "actionability"]):
+            score = 0.6 + ((seed >> (i * 4)) % 40) / 100 + random.uniform(-jitter, jitter)
+            scores[key] = round(min(1.0, max(0.0, score)), 2)
+        scores["overall"] = round(sum(scores.values()) / 4, 2)
+        return json.dumps(scores)
+
+    def _batch_scores(self, prompt: str) -> str:
+        results = []
+        for block in prompt.split("### Plan ")[1:]:
+            index = int(block.split("\n", 1)[0].strip())
+            entry = json.loads(self._scores(block))
+            entry["index"] = index
+            results.append(entry)
+        return json.dumps({"results": results})
+
+    def _filler(self) -> str:
+        return " lorem" * self.filler_words
+
+    def _respond(self, prompt: str) -> str:
+        if "### Plan " in prompt:
+            return self._batch_scores(prompt)
+        if "Generated TODO list" in prompt:
+            return self._scores(prompt)
+        if "Provide the numbered plan" in prompt:
+            return self._plan(prompt)
+        # ReAct / free-form prompts
+        todo = prompt.split("Current TODO:", 1)[-1].strip().split("\n", 1)[0]
+        return f"Action: work on '{todo}'. Observation: step completed.{self._filler()}"
+
+    # -----------------------------
+    # BaseChatModel interface
+    # -----------------------------
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = messages[-1].content if messages else ""
+        text = self._respond(prompt)
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("stub provider error")
+
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": len(prompt.split()),
+                "output_tokens": len(text.split()),
+                "total_tokens": len(prompt.split()) + len(text.split()),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = messages[-1].content if messages else ""
+        text = self._respond(prompt)
+        words = text.split(" ")
+
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            token = word if i == len(words) - 1 else word + " "
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
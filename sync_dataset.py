@@ -0,0 +1,362 @@
+# agent/sync_dataset.py
+
+"""
+Diff-based synchronization of a LangSmith dataset with a local JSONL file.
+
+The JSONL file is the source of truth. Each line is {"id": ..., "inputs": {...},
+"outputs": {...}, "metadata": {...}} (only "inputs" is required; a bare inputs
+dict also works). Local ids that are not UUIDs are mapped to stable UUIDs, and
+lines without an id get one from a hash of their content, like local_runner does.
+
+Only examples that differ are sent, through chunked bulk create / update /
+delete calls with bounded concurrency. Remote examples missing from the file
+are only deleted with --delete-missing, and never when some lines have no id
+(their hashed ids change with every edit, so they cannot identify what is gone).
+
+Usage:
+    python -m agent.sync_dataset examples.jsonl --dataset ds-granular-oleo-34 --dry-run
+    python -m agent.sync_dataset examples.jsonl --dataset ds-granular-oleo-34
+    python -m agent.sync_dataset examples.jsonl --dataset ds-granular-oleo-34 --delete-missing
+    python -m agent.sync_dataset examples.jsonl --dataset demo --local .cache/fake_langsmith.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Namespace for UUIDs derived from non-UUID local ids
+SYNC_NAMESPACE = uuid.UUID("6f1c9a52-3f0e-4d6b-9a57-2d0b8f3c7e11")
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def example_uuid(example_id) -> str:
+    """Return `example_id` as a UUID string, deriving a stable one if needed."""
+    try:
+        return str(uuid.UUID(str(example_id)))
+    except ValueError:
+        return str(uuid.uuid5(SYNC_NAMESPACE, str(example_id)))
+
+
+def load_source(path: str):
+    """
+    Load the JSONL source of truth.
+    Returns {example_uuid: {"inputs": ..., "outputs": ..., "metadata": ..., "generated_id": bool}},
+    where `generated_id` marks lines whose id was derived from their content.
+    """
+    examples = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "inputs" in record:
+                inputs = record["inputs"]
+            else:
+                inputs = {k: v for k, v in record.items() if k not in ("id", "outputs", "metadata")}
+            example_id = record.get("id")
+            generated_id = not example_id
+            if generated_id:
+                payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+                example_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+            examples[example_uuid(example_id)] = {
+                "inputs": inputs,
+                "outputs": record.get("outputs") or {},
+                "metadata": record.get("metadata"),
+                "generated_id": generated_id,
+            }
+    return examples
+
+
+def fetch_remote(client, dataset_id):
+    """Return {example_uuid: {"inputs", "outputs", "metadata"}} for the remote dataset."""
+    return {
+        str(ex.id): {"inputs": ex.inputs or {}, "outputs": ex.outputs or {}, "metadata": ex.metadata or {}}
+        for ex in client.list_examples(dataset_id=dataset_id)
+    }
+
+
+def _differs(local: dict, remote: dict) -> bool:
+    if local["inputs"] != remote["inputs"] or local["outputs"] != remote["outputs"]:
+        return True
+    # Metadata is only compared when the source sets it (the server adds its own keys)
+    return local["metadata"] is not None and any(
+        remote["metadata"].get(key) != value for key, value in local["metadata"].items()
+    )
+
+
+class SyncPlan:
+    """
+    The changes needed to make the remote dataset match the source.
+    """
+
+    def __init__(self, create: list, update: list, delete: list, unchanged: int):
+        self.create = create      # [{"id", "inputs", "outputs", "metadata"}]
+        self.update = update      # [{"id", "inputs", "outputs", "metadata"}]
+        self.delete = delete      # [example_uuid]
+        self.unchanged = unchanged
+
+    def summary(self) -> dict:
+        return {
+            "create": len(self.create),
+            "update": len(self.update),
+            "delete": len(self.delete),
+            "unchanged": self.unchanged,
+        }
+
+
+def diff(local: dict, remote: dict, delete_missing: bool = False) -> SyncPlan:
+    """
+    Compute the create / update / delete sets between source and remote.
+    With `delete_missing`, remote examples absent from the source are deleted;
+    this raises ValueError if any source id was generated from content, since
+    remote ids cannot be matched against those.
+    """
+    if delete_missing:
+        generated = sum(1 for example in local.values() if example.get("generated_id"))
+        if generated:
+            raise ValueError(
+                f"Refusing to delete missing examples: {generated} source line(s) have no id. "
+                "Give every line the id of its remote example to sync deletions."
+            )
+
+    create, update = [], []
+    unchanged = 0
+
+    for example_id, example in local.items():
+        record = {"id": example_id}
+        for field in ("inputs", "outputs", "metadata"):
+            if example.get(field) is not None:
+                record[field] = example[field]
+        if example_id not in remote:
+            create.append(record)
+        elif _differs(example, remote[example_id]):
+            update.append(record)
+        else:
+            unchanged += 1
+
+    delete = [example_id for example_id in remote if example_id not in local] if delete_missing else []
+    return SyncPlan(create, update, delete, unchanged)
+
+
+def _chunks(items: list, size: int):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def apply_plan(
+    client,
+    dataset_id,
+    plan: SyncPlan,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+):
+    """
+    Send the plan as chunked bulk calls, at most `max_concurrency` in flight.
+    Raises RuntimeError listing the failed chunks after all others were sent.
+    """
+    calls = []
+    for chunk in _chunks(plan.create, chunk_size):
+        calls.append(("create", len(chunk), lambda chunk=chunk: client.create_examples(dataset_id=dataset_id, examples=chunk)))
+    for chunk in _chunks(plan.update, chunk_size):
+        calls.append(("update", len(chunk), lambda chunk=chunk: client.update_examples(dataset_id=dataset_id, updates=chunk)))
+    for chunk in _chunks(plan.delete, chunk_size):
+        calls.append(("delete", len(chunk), lambda chunk=chunk: client.delete_examples(chunk)))
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = [(kind, size, pool.submit(call)) for kind, size, call in calls]
+        for kind, size, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"{kind} of {size} example(s): {e}")
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(calls)} bulk call(s) failed: " + "; ".join(errors))
+    return len(calls)
+
+
+def sync(
+    source_path: str,
+    dataset_name: str,
+    client=None,
+    dry_run: bool = False,
+    delete_missing: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+):
+    """
+    Make `dataset_name` match the JSONL file at `source_path`.
+    Remote examples missing from the file are kept unless `delete_missing`.
+    The dataset is created if it does not exist (except in dry-run mode).
+    Returns the SyncPlan that was (or, with dry_run, would be) applied.
+    """
+    if client is None:
+        from langsmith import Client
+        client = Client()
+
+    local = load_source(source_path)
+
+    if client.has_dataset(dataset_name=dataset_name):
+        dataset_id = client.read_dataset(dataset_name=dataset_name).id
+        remote = fetch_remote(client, dataset_id)
+    elif dry_run:
+        dataset_id, remote = None, {}
+    else:
+        dataset_id = client.create_dataset(dataset_name).id
+        print(f"📦 Dataset '{dataset_name}' created.")
+        remote = {}
+
+    plan = diff(local, remote, delete_missing=delete_missing)
+    print(f"📊 {dataset_name}: {plan.summary()}")
+
+    if dry_run:
+        print("Dry run: no changes sent.")
+        return plan
+
+    calls = apply_plan(client, dataset_id, plan, chunk_size=chunk_size, max_concurrency=max_concurrency)
+    print(f"✅ Synced with {calls} bulk call(s)")
+    return plan
+
+
+# -----------------------------
+# Local stand-in for the LangSmith API
+# -----------------------------
+class LocalDatasetClient:
+    """
+    File-backed stand-in for the dataset part of `langsmith.Client`, for trying
+    syncs offline. Keeps a count of API calls per method in `calls`.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._datasets = {}   # name -> {"id": ..., "examples": {id: {...}}}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._datasets = json.load(f)
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _save(self):
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._datasets, f, ensure_ascii=False)
+
+    def _by_id(self, dataset_id):
+        for dataset in self._datasets.values():
+            if dataset["id"] == str(dataset_id):
+                return dataset
+        raise ValueError(f"Dataset {dataset_id} not found")
+
+    def has_dataset(self, *, dataset_name: str = None, dataset_id=None) -> bool:
+        with self._lock:
+            self._count("has_dataset")
+            if dataset_name is not None:
+                return dataset_name in self._datasets
+            return any(d["id"] == str(dataset_id) for d in self._datasets.values())
+
+    def create_dataset(self, dataset_name: str, **kwargs):
+        with self._lock:
+            self._count("create_dataset")
+            self._datasets[dataset_name] = {"id": str(uuid.uuid4()), "examples": {}}
+            self._save()
+            return SimpleNamespace(id=self._datasets[dataset_name]["id"], name=dataset_name)
+
+    def read_dataset(self, *, dataset_name: str = None, dataset_id=None):
+        with self._lock:
+            self._count("read_dataset")
+            dataset = self._datasets[dataset_name] if dataset_name else self._by_id(dataset_id)
+            return SimpleNamespace(id=dataset["id"], name=dataset_name, example_count=len(dataset["examples"]))
+
+    def list_examples(self, dataset_id=None, dataset_name: str = None, **kwargs):
+        with self._lock:
+            self._count("list_examples")
+            dataset = self._datasets[dataset_name] if dataset_name else self._by_id(dataset_id)
+            examples = [
+                SimpleNamespace(id=example_id, dataset_id=dataset["id"], **example)
+                for example_id, example in dataset["examples"].items()
+            ]
+        return iter(examples)
+
+    def create_examples(self, *, dataset_id=None, examples=None, **kwargs):
+        with self._lock:
+            self._count("create_examples")
+            dataset = self._by_id(dataset_id)
+            for example in examples:
+                example_id = str(example.get("id") or uuid.uuid4())
+                dataset["examples"][example_id] = {
+                    "inputs": example.get("inputs") or {},
+                    "outputs": example.get("outputs") or {},
+                    "metadata": example.get("metadata") or {},
+                }
+            self._save()
+            return {"count": len(examples)}
+
+    def update_examples(self, *, dataset_id=None, updates=None, **kwargs):
+        with self._lock:
+            self._count("update_examples")
+            dataset = self._by_id(dataset_id)
+            for update in updates:
+                example = dataset["examples"][str(update["id"])]
+                for field in ("inputs", "outputs", "metadata"):
+                    if update.get(field) is not None:
+                        example[field] = update[field]
+            self._save()
+            return {"count": len(updates)}
+
+    def delete_examples(self, example_ids, **kwargs):
+        with self._lock:
+            self._count("delete_examples")
+            for dataset in self._datasets.values():
+                for example_id in example_ids:
+                    dataset["examples"].pop(str(example_id), None)
+            self._save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a LangSmith dataset with a local JSONL file")
+    parser.add_argument("source", help="JSONL file with the examples (source of truth)")
+    parser.add_argument("--dataset", required=True, help="Dataset name")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the diff")
+    parser.add_argument(
+        "--delete-missing",
+        action="store_true",
+        help="Delete remote examples missing locally (every line must carry its remote id)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Examples per bulk call")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Bulk calls in flight")
+    parser.add_argument("--local", help="Use a file-backed local stand-in of the LangSmith API at this path")
+    args = parser.parse_args()
+
+    if args.local:
+        client = LocalDatasetClient(args.local)
+    else:
+        from agent import config
+        from langsmith import Client
+        config.load_env()
+        client = Client()
+
+    sync(
+        args.source,
+        args.dataset,
+        client=client,
+        dry_run=args.dry_run,
+        delete_missing=args.delete_missing,
+        chunk_size=args.chunk_size,
+        max_concurrency=args.max_concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
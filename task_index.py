@@ -0,0 +1,216 @@
+# agent/task_index.py
+
+"""
+One-pass dataset normalization into a compact, memory-mapped task index.
+
+`extract_user_input` walks nested message lists, tries `json.loads` and splits on
+"Topic:" for every example, and used to run twice per example (runner + evaluator).
+Instead, a dataset is normalized once into a small binary file holding the
+extracted task strings plus their example ids, cached per dataset version.
+Lookups by example id or by inputs are O(1) and never re-parse the payload.
+
+File layout (little-endian):
+    magic  b"TASKIDX1"
+    uint32 row count (n)
+    (n + 1) uint64 offsets into the task blob
+    (n + 1) uint64 offsets into the id blob
+    n * 20 bytes   SHA-1 of each example's canonical inputs JSON
+    task blob (UTF-8), id blob (UTF-8)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+from agent import config
+
+MAGIC = b"TASKIDX1"
+DIGEST_SIZE = 20
+
+
+def inputs_digest(inputs) -> bytes:
+    """Stable digest of an example's inputs (used when only the inputs are known)."""
+    payload = json.dumps(inputs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).digest()
+
+
+class TaskIndex:
+    """
+    Read-only, memory-mapped view of a normalized dataset.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a task index file")
+
+        (self._count,) = struct.unpack_from("<I", self._mm, 8)
+        n = self._count
+        header = 12
+
+        self._task_offsets = struct.unpack_from(f"<{n + 1}Q", self._mm, header)
+        header += 8 * (n + 1)
+        self._id_offsets = struct.unpack_from(f"<{n + 1}Q", self._mm, header)
+        header += 8 * (n + 1)
+        self._digests_start = header
+        self._tasks_start = header + DIGEST_SIZE * n
+        self._ids_start = self._tasks_start + self._task_offsets[-1]
+
+        # Hash maps for O(1) lookups by example id and by inputs digest
+        self._row_by_id = {self.example_id(row): row for row in range(n)}
+        self._row_by_digest = {
+            bytes(self._mm[self._digests_start + DIGEST_SIZE * row: self._digests_start + DIGEST_SIZE * (row + 1)]): row
+            for row in range(n)
+        }
+
+    def __len__(self):
+        return self._count
+
+    def task(self, row: int) -> str:
+        start, end = self._task_offsets[row], self._task_offsets[row + 1]
+        return self._mm[self._tasks_start + start: self._tasks_start + end].decode("utf-8")
+
+    def example_id(self, row: int) -> str:
+        start, end = self._id_offsets[row], self._id_offsets[row + 1]
+        return self._mm[self._ids_start + start: self._ids_start + end].decode("utf-8")
+
+    def find(self, example):
+        """
+        Return the pre-extracted task for an example, or None if it is not indexed.
+
+        Accepts a LangSmith Example (uses `.id`), a record dict with "id",
+        or a bare inputs dict (looked up by its digest).
+        """
+        example_id = getattr(example, "id", None)
+        if example_id is None and isinstance(example, dict):
+            example_id = example.get("id")
+        if example_id is not None:
+            row = self._row_by_id.get(str(example_id))
+            if row is not None:
+                return self.task(row)
+
+        inputs = getattr(example, "inputs", example)
+        if isinstance(inputs, dict):
+            row = self._row_by_digest.get(inputs_digest(inputs))
+            if row is not None:
+                return self.task(row)
+        return None
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+# -----------------------------
+# Building
+# -----------------------------
+def build_task_index(examples, path: str):
+    """
+    Normalize `examples` ((example_id, inputs) pairs) into a task index file at `path`.
+    The file is written to a temporary name and renamed, so readers never see a partial index.
+    """
+    from agent.run_experiment import extract_user_input
+
+    tasks, ids, digests = [], [], []
+    for example_id, inputs in examples:
+        tasks.append(extract_user_input(inputs).encode("utf-8"))
+        ids.append(str(example_id).encode("utf-8"))
+        digests.append(inputs_digest(inputs))
+
+    def offsets(blobs):
+        result = [0]
+        for blob in blobs:
+            result.append(result[-1] + len(blob))
+        return result
+
+    n = len(tasks)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", n))
+        f.write(struct.pack(f"<{n + 1}Q", *offsets(tasks)))
+        f.write(struct.pack(f"<{n + 1}Q", *offsets(ids)))
+        f.write(b"".join(digests))
+        f.write(b"".join(tasks))
+        f.write(b"".join(ids))
+
+    os.replace(tmp_path, path)
+    return TaskIndex(path)
+
+
+def _cache_path(name: str, version: str, cache_dir: str = None) -> str:
+    cache_dir = cache_dir or config.TASK_INDEX_DIR
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{safe_name}-{digest}.tidx")
+
+
+def load_or_build_jsonl(path: str, cache_dir: str = None):
+    """
+    Task index for a local JSONL dataset, rebuilt only when the file changes.
+    """
+    from agent.local_runner import load_examples
+
+    stat = os.stat(path)
+    version = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    index_path = _cache_path(os.path.basename(path), version, cache_dir)
+
+    if os.path.exists(index_path):
+        return TaskIndex(index_path)
+
+    examples = load_examples(path)
+    return build_task_index(((ex["id"], ex["inputs"]) for ex in examples), index_path)
+
+
+def load_or_build_langsmith(dataset_name: str, client=None, cache_dir: str = None):
+    """
+    Task index for a LangSmith dataset, keyed on the dataset's modification time
+    and example count. Examples are only downloaded when the version changed.
+    """
+    if client is None:
+        from langsmith import Client
+        client = Client()
+
+    dataset = client.read_dataset(dataset_name=dataset_name)
+    version = f"{dataset.id}:{dataset.modified_at}:{getattr(dataset, 'example_count', None)}"
+    index_path = _cache_path(dataset_name, version, cache_dir)
+
+    if os.path.exists(index_path):
+        return TaskIndex(index_path)
+
+    examples = client.list_examples(dataset_id=dataset.id)
+    return build_task_index(((ex.id, ex.inputs) for ex in examples), index_path)
+
+
+# -----------------------------
+# Shared index
+# -----------------------------
+_active_index = None
+_active_lock = threading.Lock()
+
+
+def set_task_index(index):
+    """Make `index` the one used by `get_task_index` in this process."""
+    global _active_index
+    with _active_lock:
+        _active_index = index
+
+
+def get_task_index():
+    """
+    Return the active TaskIndex: the one set with `set_task_index`, or the file
+    named by TASK_INDEX_PATH (opened on first use). None when neither is set.
+    """
+    global _active_index
+    with _active_lock:
+        if _active_index is None and config.TASK_INDEX_PATH:
+            _active_index = TaskIndex(config.TASK_INDEX_PATH)
+        return _active_index